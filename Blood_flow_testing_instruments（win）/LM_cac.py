@@ -1,7 +1,12 @@
+import time
+from collections import namedtuple
+
 import numpy as np
 from scipy.optimize import curve_fit
 import matplotlib.pyplot as plt
 
+from exposure_table import exposure_ms_for
+
 "本程序定义了lm算法，用途：在多曝光方法中调用cac——lm进行函数拟合"
 # 定义模型函数
 def model_func_k(t, p, tao, v_noise, beta=0.25):
@@ -14,29 +19,66 @@ def model_func_k(t, p, tao, v_noise, beta=0.25):
     return term1 + term2 + term3 + v_noise
 
 
-def cac_LM(exposure_times, y_data, initial_params):
-    # 使用 Levenberg-Marquardt（'lm'）方法拟合数据
-    #t_data = np.power(10, exposure_times)
-    t_data = [x + 0 for x in exposure_times]
-    #t_data = np.log10(10 ** np.array(exposure_times))
-    params, params_covariance = curve_fit(model_func_k, t_data, y_data, p0=initial_params, method='lm')
+# 拟合结果：params 为 (p, tao_c, v_noise)，ict 为逆相关时间 1/tao_c，nfev 为 LM 的函数求值次数，wall_time 为拟合耗时（秒）
+FitResult = namedtuple("FitResult", ["params", "covariance", "residuals", "ict", "nfev", "wall_time",
+                                     "exposure_times", "y_data"])
+
+
+def fit_k2(exposure_times, y_data, initial_params, plot=False, exposure_indices=None):
     """
-    dogbox
-    trf
-    lm
+    不阻塞的拟合接口，只返回结果，plot=True 时才绘图
+    :param exposure_times: 曝光时间序列（ms）
+    :param y_data: 各曝光时间下的 k方
+    :param initial_params: (p, tao, v_noise) 初值，连续测量时可传入上一次的拟合结果
+    :param exposure_indices: 相机曝光档位序列，给出时从实测曝光表查曝光时间，表中没有的档位使用 exposure_times
+    :return: FitResult，拟合失败时返回 None
     """
+    if exposure_indices is not None:
+        exposure_times = exposure_ms_for(exposure_indices, fallback=exposure_times)
+    t_data = np.asarray(exposure_times, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    start = time.perf_counter()
+    try:
+        params, params_covariance, infodict, _, _ = curve_fit(model_func_k, t_data, y_data, p0=initial_params,
+                                                              method='lm', full_output=True)
+    except RuntimeError as e:
+        print(f"拟合失败: {e}")
+        return None
+    wall_time = time.perf_counter() - start
 
-    #qprint("拟合参数:", params)
-    print(f"p={params[0]},tao_c={params[1]},v_niose={params[2]}")
+    residuals = y_data - model_func_k(t_data, *params)
+    result = FitResult(params, params_covariance, residuals, 1 / params[1], infodict["nfev"], wall_time,
+                       t_data, y_data)
+    if plot:
+        plot_fit(result)
+    return result
 
-    # 绘制结果
-    plt.scatter(t_data, y_data, label='test_data', color='blue')
-    plt.plot(t_data, model_func_k(t_data, *params), label='curve_fitting_line', color='red')
+
+def plot_fit(result, block=True):
+    """绘制拟合结果，block=False 时不阻塞"""
+    plt.figure()
+    plt.scatter(result.exposure_times, result.y_data, label='test_data', color='blue')
+    plt.plot(result.exposure_times, model_func_k(result.exposure_times, *result.params), label='curve_fitting_line', color='red')
     plt.legend()
     plt.xlabel('exposure_time/ms')
     plt.ylabel('k^2 ')
     plt.title(' fitting results')
-    plt.show()
+    plt.show(block=block)
+
+
+def cac_LM(exposure_times, y_data, initial_params, plot=True, exposure_indices=None):
+    # 使用 Levenberg-Marquardt（'lm'）方法拟合数据
+    result = fit_k2(exposure_times, y_data, initial_params, exposure_indices=exposure_indices)
+    if result is None:
+        return None
+
+    params = result.params
+    print(f"p={params[0]},tao_c={params[1]},v_niose={params[2]}")
+
+    # 绘制结果
+    if plot:
+        plot_fit(result)
+    return result
 
 
 
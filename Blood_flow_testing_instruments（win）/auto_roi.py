@@ -0,0 +1,163 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from capture_worker import RingBuffer
+from multi_roi import MultiRoiStats, grid_rois, roi_signal
+
+"本程序按脉搏信噪比自动选择ROI：把画面分成粗网格，用积分图逐帧得到每块的散斑信号，每隔几秒用 rfft 计算 0.5~3 Hz 通带功率占比，锁定得分最高的图块或相邻图块组成的区域，探头移动时在后台周期性重新评估"
+
+
+def band_power_ratio(timestamps, values, band=(0.5, 3.0)):
+    """
+    :param timestamps: (M,) 帧时间戳（秒），可不等间隔
+    :param values: (M, N) 每列一个图块的信号
+    :return: (N,) 通带功率 / 总交流功率
+    """
+    duration = timestamps[-1] - timestamps[0]
+    m = len(timestamps)
+    if m < 8 or duration <= 0:
+        return np.zeros(values.shape[1])
+    # 按平均帧率插值到等间隔网格后再做 FFT
+    fs = (m - 1) / duration
+    uniform_t = timestamps[0] + np.arange(m) / fs
+    # 所有图块共用时间轴，插值权重只算一次
+    right = np.clip(np.searchsorted(timestamps, uniform_t), 1, m - 1)
+    left = right - 1
+    weight = ((uniform_t - timestamps[left]) / np.maximum(timestamps[right] - timestamps[left], 1e-12))[:, None]
+    uniform = values[left] * (1 - weight) + values[right] * weight
+    uniform -= uniform.mean(axis=0)
+    spectrum = np.abs(np.fft.rfft(uniform * np.hanning(m)[:, None], axis=0)) ** 2
+    freqs = np.fft.rfftfreq(m, 1.0 / fs)
+    in_band = (freqs >= band[0]) & (freqs <= band[1])
+    total = spectrum[1:].sum(axis=0)
+    return np.where(total > 0, spectrum[in_band].sum(axis=0) / np.maximum(total, 1e-300), 0.0)
+
+
+class AutoRoiSelector:
+    def __init__(self, tile=31, cluster=2, window_s=5.0, evaluate_every_s=2.0, band=(0.5, 3.0), data_type=0,
+                 hysteresis=1.2, region=None, capacity=512, background=True):
+        """
+        :param tile: 网格边长（像素）
+        :param cluster: 锁定 cluster×cluster 个相邻图块组成的区域，1 为单个图块
+        :param window_s: 评分使用的时间窗（秒）
+        :param evaluate_every_s: 重新评估的间隔（秒）
+        :param band: 脉搏频带（Hz）
+        :param data_type: 同 cac_k 的 sign
+        :param hysteresis: 新区域得分超过当前区域该倍数才切换，避免ROI来回跳动
+        :param region: 只在该矩形 (x1, y1, x2, y2) 内搜索，默认整幅图
+        :param capacity: 每块信号的缓冲帧数，需覆盖 window_s
+        :param background: True 时评分在后台线程进行（FFT 期间释放 GIL），采集线程只在下一帧取结果
+        """
+        self.tile = tile
+        self.cluster = cluster
+        self.window_s = window_s
+        self.evaluate_every_s = evaluate_every_s
+        self.band = band
+        self.data_type = data_type
+        self.hysteresis = hysteresis
+        self.region = region
+        self.capacity = capacity
+        self.stats = None
+        self.buffer = None
+        self.grid_shape = None
+        self.score_map = None
+        self.roi = None
+        self.roi_score = 0.0
+        self.evaluations = 0
+        self.evaluate_time = 0.0  # 最近一次评估耗时（秒）
+        self._block = None
+        self._start_t = None
+        self._last_eval_t = None
+        self._last_values = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = None
+
+    def _setup(self, frame):
+        rois = grid_rois(frame.shape, self.tile, self.region)
+        self.stats = MultiRoiStats(rois)
+        xs = np.unique(rois[:, 0])
+        ys = np.unique(rois[:, 1])
+        self.grid_shape = (len(ys), len(xs))
+        self.buffer = RingBuffer(self.capacity, len(rois))
+
+    def update(self, frame, timestamp):
+        """
+        每帧调用，开销为一次积分图
+        :return: 锁定的ROI (x1, y1, x2, y2)，首次评估前返回 None
+        """
+        if self.stats is None:
+            self._setup(frame)
+            self._start_t = timestamp
+        values = roi_signal(self.stats.compute(frame), self.data_type)
+        if self._last_values is not None:
+            values = np.where(np.isfinite(values), values, self._last_values)
+        self._last_values = values
+        self.buffer.push(timestamp, np.where(np.isfinite(values), values, 0.0))
+
+        if self._pending is not None and self._pending.done():
+            self._apply(self._pending.result())
+            self._pending = None
+
+        due = self._last_eval_t is None and timestamp - self._start_t >= self.window_s
+        due = due or (self._last_eval_t is not None and timestamp - self._last_eval_t >= self.evaluate_every_s)
+        if due and self._pending is None:
+            self._last_eval_t = timestamp
+            # latest 返回副本，后台线程不会与后续写入冲突
+            timestamps, values = self.buffer.latest(self.capacity)
+            keep = timestamps >= timestamp - self.window_s
+            if self._executor is not None:
+                self._pending = self._executor.submit(self._score, timestamps[keep], values[keep])
+            else:
+                self._apply(self._score(timestamps[keep], values[keep]))
+        return self.roi
+
+    def _score(self, timestamps, values):
+        start = time.perf_counter()
+        scores = band_power_ratio(timestamps, values, self.band)
+        self.evaluate_time = time.perf_counter() - start
+        return scores.reshape(self.grid_shape)
+
+    def _apply(self, score_map):
+        self.score_map = score_map
+
+        # 相邻 cluster×cluster 图块得分取平均，选最高的一组
+        size = min(self.cluster, *self.grid_shape)
+        block = cv2.blur(self.score_map.astype(np.float32), (size, size), anchor=(0, 0),
+                         borderType=cv2.BORDER_CONSTANT)
+        block = block[:self.grid_shape[0] - size + 1, :self.grid_shape[1] - size + 1]
+        row, col = np.unravel_index(int(np.argmax(block)), block.shape)
+        best = float(block[row, col])
+
+        if self._block is not None:
+            # 重新评估当前锁定区域的得分，用于滞回比较
+            cur_row, cur_col = self._block
+            self.roi_score = float(block[cur_row, cur_col])
+        if self._block is None or best > self.hysteresis * self.roi_score:
+            self._block = (row, col)
+            self.roi_score = best
+            x1, y1 = self.stats.rois[row * self.grid_shape[1] + col][:2]
+            span = size * self.tile
+            self.roi = (int(x1), int(y1), int(x1) + span, int(y1) + span)
+        self.evaluations += 1
+
+
+if __name__ == "__main__":
+    # 仿真相机上测量每帧开销与评估开销
+    from speckle_sim import SpeckleSimulator
+
+    sim = SpeckleSimulator(size=496, pulse_depth=0.5, fps=30, seed=0)
+    selector = AutoRoiSelector(tile=31, cluster=2)
+    frames = 300
+    per_frame = []
+    for i in range(frames):
+        ret, frame = sim.read()
+        start = time.perf_counter()
+        roi = selector.update(frame, i / sim.fps)
+        per_frame.append(time.perf_counter() - start)
+    per_frame = np.array(per_frame) * 1000
+    print(f"每帧 {np.median(per_frame):.2f} ms（最大 {per_frame.max():.2f} ms），"
+          f"评估 {selector.evaluations} 次，最近一次 {selector.evaluate_time * 1000:.2f} ms")
+    print(f"锁定 ROI {roi}，得分 {selector.roi_score:.3f}")
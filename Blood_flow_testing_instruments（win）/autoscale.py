@@ -0,0 +1,135 @@
+import math
+from collections import deque
+
+"本程序为实时曲线的 Y 轴自动缩放：用单调队列维护最近 window 个样本的最小/最大值（每个样本均摊 O(1)），状态保存在每个坐标轴各自的对象里，只有窗口极值的相对变化超过阈值时才调用 set_ylim，替代各文件中基于全局变量、每帧对整个 deque 求 min/max 的 update_y_axis"
+
+
+class RollingExtrema:
+    def __init__(self, window):
+        """
+        :param window: 窗口长度（样本数）
+        """
+        self.window = window
+        self.count = 0
+        # (样本序号, 值)；_max 中值单调递减，_min 中值单调递增，队首即窗口极值
+        self._max = deque()
+        self._min = deque()
+
+    def push(self, value):
+        """加入一个样本，非有限值只占位不参与极值"""
+        index = self.count
+        self.count += 1
+        if math.isfinite(value):
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((index, value))
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((index, value))
+        oldest = self.count - self.window
+        while self._max and self._max[0][0] < oldest:
+            self._max.popleft()
+        while self._min and self._min[0][0] < oldest:
+            self._min.popleft()
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+
+class AxisAutoscaler:
+    def __init__(self, ax, window=80, min_samples=80, threshold=0.05, smoothing=0.95, margin=1.3):
+        """
+        与原 update_y_axis 的规则相同：窗口极值相对上次设置的值变化均小于 threshold 时不调整，
+        调整时与上次的值按 smoothing 加权，并在上下各留出 margin 倍的极差
+        :param ax: matplotlib 坐标轴
+        :param window: 计算极值的最近样本数
+        :param min_samples: 累计样本数不足时不调整
+        """
+        self.ax = ax
+        self.extrema = RollingExtrema(window)
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.margin = margin
+        self.y_min = None
+        self.y_max = None
+        self.updates = 0  # set_ylim 调用次数
+
+    def push(self, value):
+        self.extrema.push(value)
+
+    def extend(self, values):
+        self.extrema.extend(values)
+
+    def update(self):
+        """
+        按当前窗口极值决定是否调整 Y 轴
+        :return: 是否调用了 set_ylim（blit 绘图时调用方据此决定是否需要整幅重绘）
+        """
+        y_min, y_max = self.extrema.min, self.extrema.max
+        if self.extrema.count < self.min_samples or y_min is None:
+            return False
+        margin = (y_max - y_min) * self.margin
+
+        if self.y_min is not None:
+            min_change = abs(y_min - self.y_min) / max(abs(self.y_min), 1e-5)
+            max_change = abs(y_max - self.y_max) / max(abs(self.y_max), 1e-5)
+            if min_change < self.threshold and max_change < self.threshold:
+                return False
+            y_min = self.smoothing * y_min + (1 - self.smoothing) * self.y_min
+            y_max = self.smoothing * y_max + (1 - self.smoothing) * self.y_max
+
+        self.ax.set_ylim(y_min - margin, y_max + margin)
+        self.y_min, self.y_max = y_min, y_max
+        self.updates += 1
+        return True
+
+
+if __name__ == "__main__":
+    # 与原 update_y_axis（每帧 list(deque) 后对最近 80 个样本求 min/max）对比每帧开销
+    import time
+
+    import numpy as np
+
+    class _Axis:
+        def set_ylim(self, low, high):
+            pass
+
+    def run_old(samples):
+        history = deque(maxlen=500)
+        for value in samples:
+            history.append(value)
+            recent = list(history)[-80:]
+            min(recent), max(recent)
+
+    def run_new(samples):
+        scaler = AxisAutoscaler(_Axis())
+        for value in samples:
+            scaler.push(value)
+            scaler.update()
+        return scaler
+
+    def best_us(func, samples, repeats=5):
+        # 取多次运行中最快的一次，减少调度抖动对结果的影响
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(samples)
+            timings.append(time.perf_counter() - start)
+        return min(timings) / len(samples) * 1e6
+
+    rng = np.random.default_rng(0)
+    samples = np.cumsum(rng.standard_normal(20000)).tolist()
+    old_us = best_us(run_old, samples)
+    new_us = best_us(run_new, samples)
+    print(f"原方法 {old_us:.2f} us/帧，单调队列 {new_us:.2f} us/帧（5 次取最快），"
+          f"{len(samples)} 帧中 set_ylim 调用 {run_new(samples).updates} 次")
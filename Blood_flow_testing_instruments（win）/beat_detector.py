@@ -0,0 +1,228 @@
+import math
+from collections import deque, namedtuple
+
+import numpy as np
+
+"本程序为逐拍脉搏检测：在流式滤波后的脉搏波上在线寻找收缩峰与波谷（足点），每个样本 O(1)，峰值在回落到幅度的一定比例或超过最大延迟时立即确认，输出逐拍间期、滚动 RMSSD/SDNN 以及按足点对齐的集合平均脉搏模板"
+
+Beat = namedtuple("Beat", ["peak_time", "peak_value", "foot_time", "foot_value", "interval", "report_time"])
+
+
+class RollingHrv:
+    def __init__(self, window=30):
+        """
+        :param window: 参与统计的最近间期个数
+        """
+        self.window = window
+        self.intervals = deque()
+        self.diffs = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._diff_sum_sq = 0.0
+
+    def add(self, interval):
+        """加入一个间期（秒），运行和随窗口滑动增减"""
+        if self.intervals:
+            diff = interval - self.intervals[-1]
+            self.diffs.append(diff)
+            self._diff_sum_sq += diff * diff
+        self.intervals.append(interval)
+        self._sum += interval
+        self._sum_sq += interval * interval
+        if len(self.intervals) > self.window:
+            old = self.intervals.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+            old_diff = self.diffs.popleft()
+            self._diff_sum_sq -= old_diff * old_diff
+
+    @property
+    def sdnn(self):
+        """间期标准差（ms）"""
+        n = len(self.intervals)
+        if n < 2:
+            return None
+        var = (self._sum_sq - self._sum * self._sum / n) / (n - 1)
+        return math.sqrt(max(var, 0.0)) * 1000
+
+    @property
+    def rmssd(self):
+        """相邻间期差的均方根（ms）"""
+        if not self.diffs:
+            return None
+        return math.sqrt(max(self._diff_sum_sq, 0.0) / len(self.diffs)) * 1000
+
+    @property
+    def mean_bpm(self):
+        if not self.intervals:
+            return None
+        return 60 * len(self.intervals) / self._sum
+
+
+class BeatDetector:
+    def __init__(self, min_interval=0.33, max_interval=2.0, drop_fraction=0.4, max_latency=0.35,
+                 amplitude_alpha=0.2, hrv_window=30, template_points=64, template_alpha=0.1, invert=False):
+        """
+        :param min_interval: 最短间期（秒），对应 180 次/分，也是不应期
+        :param max_interval: 最长间期（秒），超出时不计入间期统计
+        :param drop_fraction: 信号从候选峰回落到幅度的该比例时确认该峰
+        :param max_latency: 候选峰之后最多等待的时间（秒），超过即确认，保证报告延迟有界
+        :param amplitude_alpha: 脉搏幅度（峰-足）指数平均的系数，幅度变大时用较快的 0.3 跟随
+        :param hrv_window: RMSSD/SDNN 使用的间期个数
+        :param template_points: 模板在一个心动周期（足点到下一足点）内的采样点数
+        :param template_alpha: 模板集合平均的更新系数
+        :param invert: 收缩期对应波形的谷时设为 True
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.drop_fraction = drop_fraction
+        self.max_latency = max_latency
+        self.amplitude_alpha = amplitude_alpha
+        self.template_points = template_points
+        self.template_alpha = template_alpha
+        self.sign = -1.0 if invert else 1.0
+        self.hrv = RollingHrv(hrv_window)
+        self.beats = deque(maxlen=256)
+        self.template = None
+        self.template_count = 0
+        self.amplitude = None
+        # 足点到下一足点的样本，只保留最长间期内的数据
+        self._history = deque()
+        self._reset_search(None, None)
+        self._last_peak_time = None
+        self._last_foot = None
+        self._last_report = None
+
+    def _reset_search(self, t, x):
+        # 候选足点为上一峰之后的最小值，候选峰为足点之后的最大值
+        self._foot_t = t
+        self._foot_x = x
+        self._cand_t = None
+        self._cand_x = None
+
+    @property
+    def refractory(self):
+        """不应期（秒）：不短于 min_interval，心率稳定后取平均间期的 60%"""
+        mean_bpm = self.hrv.mean_bpm
+        if mean_bpm is None or len(self.hrv.intervals) < 3:
+            return self.min_interval
+        return max(self.min_interval, 0.6 * 60 / mean_bpm)
+
+    @property
+    def last_beat(self):
+        return self.beats[-1] if self.beats else None
+
+    @property
+    def bpm(self):
+        """最近一拍的瞬时心率（次/分）"""
+        beat = self.last_beat
+        if beat is None or beat.interval is None:
+            return None
+        return 60 / beat.interval
+
+    def update(self, timestamp, value):
+        """
+        加入一个滤波后的样本
+        :return: 本样本确认的 Beat，没有时返回 None
+        """
+        if not math.isfinite(value):
+            return None
+        x = self.sign * value
+        self._history.append((timestamp, x))
+        while timestamp - self._history[0][0] > self.max_interval + self.max_latency:
+            self._history.popleft()
+        if self._last_report is None:
+            self._last_report = timestamp
+        elif self.amplitude is not None and timestamp - self._last_report > self.max_interval:
+            # 长时间没有确认的拍（幅度骤降或启动瞬态抬高了幅度），逐步降低幅度门限
+            self.amplitude *= 0.5
+            self._last_report = timestamp
+
+        if self._foot_x is None or (self._cand_t is None and x <= self._foot_x):
+            # 尚未出现上升，持续更新足点
+            self._foot_t, self._foot_x = timestamp, x
+            return None
+        if self._cand_x is None or x > self._cand_x:
+            self._cand_t, self._cand_x = timestamp, x
+            return None
+
+        rise = self._cand_x - self._foot_x
+        threshold = self.drop_fraction * (self.amplitude if self.amplitude is not None else rise)
+        if self._cand_x - x < threshold and timestamp - self._cand_t < self.max_latency:
+            return None
+
+        # 上升幅度不足平均幅度的 35% 时视为噪声或重搏波，重新寻找足点
+        if self.amplitude is not None and rise < 0.35 * self.amplitude:
+            self._reset_search(timestamp, x)
+            return None
+        if self._last_peak_time is not None and self._cand_t - self._last_peak_time < self.refractory:
+            # 不应期内的峰（如重搏波）丢弃
+            self._reset_search(timestamp, x)
+            return None
+        return self._confirm(timestamp, x, rise)
+
+    def _confirm(self, timestamp, x, rise):
+        if self.amplitude is None:
+            self.amplitude = rise
+        else:
+            alpha = 0.3 if rise > self.amplitude else self.amplitude_alpha
+            self.amplitude = (1 - alpha) * self.amplitude + alpha * rise
+        self._last_report = timestamp
+        interval = None
+        if self._last_peak_time is not None:
+            interval = self._cand_t - self._last_peak_time
+            if interval <= self.max_interval:
+                self.hrv.add(interval)
+            else:
+                interval = None
+        beat = Beat(self._cand_t, self.sign * self._cand_x, self._foot_t, self.sign * self._foot_x, interval, timestamp)
+        if self._last_foot is not None and interval is not None:
+            self._update_template(self._last_foot, self._foot_t)
+        self._last_peak_time = self._cand_t
+        self._last_foot = self._foot_t
+        self.beats.append(beat)
+        self._reset_search(timestamp, x)
+        return beat
+
+    def _update_template(self, start, stop):
+        """上一足点到本足点为一个完整周期，按相位重采样后做指数集合平均"""
+        times = np.fromiter((t for t, _ in self._history), float, len(self._history))
+        values = np.fromiter((v for _, v in self._history), float, len(self._history))
+        if times[0] > start:
+            return
+        grid = np.linspace(start, stop, self.template_points)
+        cycle = self.sign * np.interp(grid, times, values)
+        cycle -= cycle[0]
+        span = np.ptp(cycle)
+        if span <= 0:
+            return
+        cycle /= span
+        if self.template is None:
+            self.template = cycle
+        else:
+            self.template = (1 - self.template_alpha) * self.template + self.template_alpha * cycle
+        self.template_count += 1
+
+
+if __name__ == "__main__":
+    # 合成脉搏上的检测精度、报告延迟与每样本开销
+    import time
+
+    from heart_rate import synthetic_pulse
+
+    fps = 30
+    for bpm in (50, 72, 110, 150):
+        timestamps, values = synthetic_pulse(60, fps, bpm, noise=0.2, seed=bpm)
+        detector = BeatDetector()
+        start = time.thread_time()
+        beats = [b for b in (detector.update(t, v) for t, v in zip(timestamps, values)) if b is not None]
+        per_sample = (time.thread_time() - start) / len(values) * 1e6
+        # 跳过前 5 s 的滤波器启动瞬态
+        beats = [b for b in beats if b.peak_time > 5]
+        intervals = np.array([b.interval for b in beats if b.interval is not None])
+        latency = np.array([b.report_time - b.peak_time for b in beats])
+        expected = bpm * (timestamps[-1] - 5) / 60
+        print(f"{bpm} 次/分: 检出 {len(beats)} 拍（期望 {expected:.0f} 拍），中位间期 {60 / np.median(intervals):.1f} 次/分，"
+              f"RMSSD {detector.hrv.rmssd:.1f} ms，SDNN {detector.hrv.sdnn:.1f} ms，"
+              f"报告延迟 {latency.mean() * 1000:.0f}/{latency.max() * 1000:.0f} ms（平均/最大），"
+              f"{per_sample:.1f} us/样本")
@@ -0,0 +1,120 @@
+import json
+import os
+import time
+
+import cv2
+
+from camera_source import open_camera
+
+"本程序为激光功率标定结果的本地缓存：按相机编号、曝光序列、ROI 大小、均值窗口、激光器固件版本记录标定功率，同时记录 TEC 温度与时间；再次运行时温度未漂移且逐曝光单帧验证通过则直接使用，否则重新标定"
+
+CALIBRATION_CACHE_FILE = "calibration_cache.json"
+
+
+def context_key(camera_index, exposure_times, roi_size, k_min, k_max, firmware_version):
+    return json.dumps([str(camera_index), list(exposure_times), roi_size, k_min, k_max, firmware_version])
+
+
+class CalibrationCache:
+    def __init__(self, path=CALIBRATION_CACHE_FILE, temperature_tolerance=1.0, verify_margin=10):
+        """
+        :param path: 缓存文件
+        :param temperature_tolerance: TEC 温度允许的漂移（°C）
+        :param verify_margin: 单帧验证时均值窗口放宽的灰度，避免单帧噪声误判
+        """
+        self.path = path
+        self.temperature_tolerance = temperature_tolerance
+        self.verify_margin = verify_margin
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"标定缓存读取失败，将重新标定: {e}")
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+
+    def lookup(self, camera_index, exposure_times, roi_size, k_min, k_max, firmware_version, tec_temperature):
+        """
+        :return: 上下文一致且 TEC 温度未漂移的缓存条目，否则返回 None
+        """
+        entry = self.entries.get(context_key(camera_index, exposure_times, roi_size, k_min, k_max, firmware_version))
+        if entry is None:
+            return None
+        if tec_temperature is not None and entry["tec_temperature"] is not None \
+                and abs(tec_temperature - entry["tec_temperature"]) > self.temperature_tolerance:
+            print(f"TEC 温度由 {entry['tec_temperature']} °C 变为 {tec_temperature} °C，缓存失效")
+            return None
+        return entry
+
+    def store(self, camera_index, exposure_times, roi_size, k_min, k_max, firmware_version, tec_temperature, powers):
+        entry = {
+            "camera_index": str(camera_index),
+            "exposure_times": list(exposure_times),
+            "roi_size": roi_size,
+            "k_min": k_min,
+            "k_max": k_max,
+            "firmware_version": firmware_version,
+            "tec_temperature": tec_temperature,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "leaser_powers": list(powers),
+        }
+        self.entries[context_key(camera_index, exposure_times, roi_size, k_min, k_max, firmware_version)] = entry
+        self.save()
+        return entry
+
+    def verify(self, controller, cap, entry):
+        """
+        逐曝光写入缓存功率，各取一帧检查 ROI 均值是否仍在（放宽后的）窗口内
+        :return: 是否全部通过
+        """
+        k_min = entry["k_min"] - self.verify_margin
+        k_max = entry["k_max"] + self.verify_margin
+        for exposure, power in zip(entry["exposure_times"], entry["leaser_powers"]):
+            cap.set(cv2.CAP_PROP_EXPOSURE, float(exposure))
+            controller.set_power_state(power)
+            # 丢弃参数变化前缓存的帧
+            for _ in range(2):
+                cap.read()
+            ret, frame = cap.read()
+            if not ret:
+                print("验证时无法读取图像")
+                return False
+            frame, (x1, y1, x2, y2) = controller.set_roi(frame, roi_size=entry["roi_size"])
+            mean = controller.calculate_histogram_mean(frame[y1:y2, x1:x2])
+            if not k_min <= mean <= k_max:
+                print(f"曝光 {exposure}: 功率 {power} 下均值 {mean:.2f} 超出窗口，缓存失效")
+                return False
+        return True
+
+
+def load_or_calibrate(controller, camera_index, exposure_times, roi_size, k_min, k_max, fps=20, initial_power=200,
+                      cache_path=CALIBRATION_CACHE_FILE, show=True):
+    """
+    有有效缓存时直接使用，否则调用 controller.leaser_calibration 重新标定并写入缓存
+    :param controller: 已打开串口的 ComSetting
+    :return: 激光功率序列
+    """
+    cache = CalibrationCache(cache_path)
+    firmware_version = controller.query(controller.version)
+    tec_temperature = controller.query(controller.TEC_temperature)
+    entry = cache.lookup(camera_index, exposure_times, roi_size, k_min, k_max, firmware_version, tec_temperature)
+    if entry is not None:
+        cap = open_camera(camera_index)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        start = time.perf_counter()
+        valid = cap.isOpened() and cache.verify(controller, cap, entry)
+        if cap is not camera_index:  # 传入的相机对象由调用方负责释放
+            cap.release()
+        if valid:
+            print(f"使用 {entry['timestamp']} 的标定结果（验证耗时 {time.perf_counter() - start:.1f} s）")
+            return entry["leaser_powers"]
+
+    powers = controller.leaser_calibration(k_min, k_max, exposure_times, camera_index, fps=fps, roi_size=roi_size,
+                                           initial_power=initial_power, show=show)
+    if len(powers) == len(exposure_times):
+        cache.store(camera_index, exposure_times, roi_size, k_min, k_max, firmware_version, tec_temperature, powers)
+    return powers
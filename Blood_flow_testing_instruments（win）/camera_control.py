@@ -5,6 +5,7 @@ import time
 from matplotlib import pyplot as plt
 
 from leaser_control import ComSetting
+from camera_source import open_camera
 
 "该程序用于调试相机曝光时间与帧率，ws键分别控制曝光补偿增加或减小，通过帧率反算出绝对曝光时间"
 def draw_roi(frame, roi_size=50):
@@ -49,7 +50,7 @@ def plot_on_frame(frame, values, max_length=100):
 def main(camera_index=0, initial_exposure=-4, step=1, fps=30, roi_size=50):
     # 初始化相机
     controller = ComSetting()
-    cap = cv2.VideoCapture(camera_index)
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("无法打开相机")
         return
@@ -0,0 +1,25 @@
+import os
+from urllib.parse import parse_qsl
+
+import cv2
+
+from recording import ReplayCapture
+from speckle_sim import SpeckleSimulator
+
+"本程序统一各入口的相机打开方式：整数为相机编号，录制目录则使用回放相机，sim:// 开头使用散斑仿真相机，使 s_DSCA、m_DSCA 等无需探头也能运行"
+
+
+def open_camera(source, realtime=True):
+    """
+    :param source: 相机编号、录制目录、"sim://tau_c=5&heart_rate=72" 形式的仿真参数，或已提供 read() 的相机对象
+    :param realtime: 回放录制时是否按原始节奏
+    :return: 具有 read()/set()/get()/isOpened()/release() 的相机对象
+    """
+    if hasattr(source, "read"):
+        return source
+    if isinstance(source, str) and source.startswith("sim://"):
+        params = {key: float(value) for key, value in parse_qsl(source[len("sim://"):])}
+        return SpeckleSimulator(realtime=realtime, **params)
+    if isinstance(source, str) and os.path.isdir(source):
+        return ReplayCapture(source, realtime=realtime)
+    return cv2.VideoCapture(source)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import numpy as np
+
+"本程序为独立采集线程，以相机全帧率读取图像并计算ROI统计量，写入预分配的无锁环形缓冲区，绘图端按自己的节奏读取最新窗口"
+
+
+class RingBuffer:
+    def __init__(self, capacity, n_fields):
+        """
+        单生产者/单消费者环形缓冲区，数组一次性预分配
+        :param capacity: 容量（样本数），应明显大于绘图端一次读取的窗口
+        :param n_fields: 每个样本的统计量个数
+        """
+        self.capacity = capacity
+        self.n_fields = n_fields
+        self.timestamps = np.zeros(capacity)
+        self.values = np.zeros((capacity, n_fields))
+        # 已写入的样本总数，只由生产者递增；先写数据再递增，读端看到的计数总是已写完的
+        self.count = 0
+
+    def push(self, timestamp, values):
+        slot = self.count % self.capacity
+        self.timestamps[slot] = timestamp
+        self.values[slot] = values
+        self.count += 1
+
+    def _take(self, start, stop):
+        idx = np.arange(start, stop) % self.capacity
+        return self.timestamps[idx], self.values[idx]
+
+    def latest(self, n):
+        """
+        读取最新的 n 个样本（按时间顺序的副本）
+        :return: (timestamps, values)
+        """
+        stop = self.count
+        start = max(0, stop - min(n, self.capacity))
+        return self._take(start, stop)
+
+    def read_since(self, seq):
+        """
+        读取序号 seq 之后写入的所有样本
+        :param seq: 上一次读取返回的序号，首次为 0
+        :return: (timestamps, values, 新序号, 因读取过慢被覆盖而丢失的样本数)
+        """
+        stop = self.count
+        lost = max(0, stop - self.capacity - seq)
+        start = seq + lost
+        timestamps, values = self._take(start, stop)
+        return timestamps, values, stop, lost
+
+
+class CaptureWorker(threading.Thread):
+    def __init__(self, cap, roi_size, stats_func, n_fields=1, capacity=4096, roi_selector=None):
+        """
+        :param cap: 已打开的相机对象，需提供 read()
+        :param roi_size: 中心计算区域大小
+        :param stats_func: 输入ROI图像，返回长度为 n_fields 的统计量序列
+        :param n_fields: 每帧统计量个数
+        :param capacity: 环形缓冲区容量
+        :param roi_selector: 自动选ROI对象（如 auto_roi.AutoRoiSelector），每帧调用 update(frame, timestamp)，
+                             返回 None 前使用中心ROI
+        """
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.roi_size = roi_size
+        self.stats_func = stats_func
+        self.roi_selector = roi_selector
+        self.buffer = RingBuffer(capacity, n_fields)
+        self.roi = None
+        self.latest_frame = None
+        self.dropped_frames = 0
+        self.failed_reads = 0
+        self._frame_dt = None
+        self._running = threading.Event()
+
+    def _center_roi(self, frame):
+        height, width = frame.shape[:2]
+        x1 = (width - self.roi_size) // 2
+        y1 = (height - self.roi_size) // 2
+        return x1, y1, x1 + self.roi_size, y1 + self.roi_size
+
+    def _count_gap(self, dt):
+        """帧间隔明显大于平均间隔时，按间隔倍数计入丢帧"""
+        if self._frame_dt is not None and dt > 1.5 * self._frame_dt:
+            self.dropped_frames += int(round(dt / self._frame_dt)) - 1
+        else:
+            self._frame_dt = dt if self._frame_dt is None else 0.95 * self._frame_dt + 0.05 * dt
+
+    def run(self):
+        self._running.set()
+        last_t = None
+        while self._running.is_set():
+            ret, frame = self.cap.read()
+            timestamp = time.perf_counter()
+            if not ret:
+                self.failed_reads += 1
+                self.dropped_frames += 1
+                time.sleep(0.001)
+                continue
+
+            if self.roi_selector is not None:
+                selected = self.roi_selector.update(frame, timestamp)
+                if selected is not None:
+                    self.roi = selected
+            if self.roi is None:
+                self.roi = self._center_roi(frame)
+            x1, y1, x2, y2 = self.roi
+            self.buffer.push(timestamp, self.stats_func(frame[y1:y2, x1:x2]))
+            self.latest_frame = frame
+
+            if last_t is not None:
+                self._count_gap(timestamp - last_t)
+            last_t = timestamp
+
+    def stop(self, timeout=1.0):
+        self._running.clear()
+        if self.is_alive():
+            self.join(timeout)
+
+    @property
+    def frame_rate(self):
+        """按平均帧间隔估计的实际采集帧率"""
+        return 1.0 / self._frame_dt if self._frame_dt else None
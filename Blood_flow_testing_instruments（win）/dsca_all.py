@@ -3,40 +3,15 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy.signal import butter, sosfilt
 from collections import deque
 
 from leaser_control import ComSetting
+from capture_worker import CaptureWorker
+from camera_source import open_camera
+from speckle_stats import speckle_stats
+from autoscale import AxisAutoscaler
 
 "该程序用于单曝光测量测试程序，直接输出波形，自动调整y轴范围，封装函数s_DSCA_all"
-prev_y_min, prev_y_max = [None]*4, [None]*4
-adjust_threshold = 0.05
-smoothing_factor = 0.95
-
-def update_y_axis(ax, filtered_y_data, idx):
-    global prev_y_min, prev_y_max
-
-    if len(filtered_y_data) < 80:
-        return
-
-    recent_data = list(filtered_y_data)[-80:]
-    y_min, y_max = min(recent_data), max(recent_data)
-    margin = (y_max - y_min) * 1.3
-    y_center = (y_max + y_min) / 2
-
-    if prev_y_min[idx] is not None and prev_y_max[idx] is not None:
-        min_change = abs(y_min - prev_y_min[idx]) / max(abs(prev_y_min[idx]), 1e-5)
-        max_change = abs(y_max - prev_y_max[idx]) / max(abs(prev_y_max[idx]), 1e-5)
-
-        if min_change < adjust_threshold and max_change < adjust_threshold:
-            return
-
-    if prev_y_min[idx] is not None and prev_y_max[idx] is not None:
-        y_min = smoothing_factor * y_min + (1 - smoothing_factor) * prev_y_min[idx]
-        y_max = smoothing_factor * y_max + (1 - smoothing_factor) * prev_y_max[idx]
-
-    ax.set_ylim(y_min - margin, y_max + margin)
-    prev_y_min[idx], prev_y_max[idx] = y_min, y_max
 
 def draw_roi(frame, roi_size=50):
     height, width, _ = frame.shape
@@ -61,19 +36,23 @@ def cac_k(roi_frame, sign):
     elif sign == 3:
         return -1/((K ** 2) + 1/mean_i + 1/(12*(mean_i ** 2)))
 
-def butter_bandpass_sos(lowcut, highcut, fs, order=2):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    sos = butter(order, [low, high], btype='band', output='sos')
-    return sos
-
-def bandpass_filter(data, lowcut, highcut, fs, order=2):
-    sos = butter_bandpass_sos(lowcut, highcut, fs, order)
-    return sosfilt(sos, data)
-
-def s_DSCA_all(initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
-    cap = cv2.VideoCapture(camera_index)
+def cac_k_all(roi_frame, signs=(0, 1, 2, 2)):
+    """
+    一次计算多个 cac_k 取值，ROI只转换、遍历一次
+    :param signs: 与 cac_k 的 sign 含义相同的标志位序列
+    :return: 与 [cac_k(roi_frame, s) for s in signs] 相同的列表
+    """
+    stats = speckle_stats(roi_frame)
+    values = {
+        0: -stats.inv_k2 if stats.k2 != 0 else float('inf'),
+        1: -stats.shot_noise,
+        2: -stats.shot_noise - stats.quant_noise,
+        3: -1 / (stats.k2 + stats.shot_noise + stats.quant_noise),
+    }
+    return [values[sign] for sign in signs]
+
+def s_DSCA_all(initial_power=50, camera_index=0, fps=60, size=496, roi_size=50, plot_interval=50):
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("无法打开相机")
         return
@@ -106,6 +85,8 @@ def s_DSCA_all(initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
     ]
     for i in range(4):
         axs[i].set_ylim(custom_y_ranges[i])  # 固定Y轴范围
+    # 每个坐标轴各自维护窗口极值与上次范围
+    y_scalers = [AxisAutoscaler(ax) for ax in axs]
 
     for i in range(4):
         lines.append(axs[i].plot([], [], 'r-')[0])
@@ -113,41 +94,43 @@ def s_DSCA_all(initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
         axs[i].set_xlabel("Frame")
         axs[i].set_ylabel("Value")
 
-    def update_plot(frame_num):
-        ret, frame = cap.read()
-        if not ret:
-            return lines
+    # ✅ 将第4个图使用 sign=2
+    signs = [0, 1, 2, 2]
+    # 采集线程以相机全帧率计算四个处理值，绘图只读取新样本
+    worker = CaptureWorker(cap, roi_size, lambda roi_frame: cac_k_all(roi_frame, signs), n_fields=4)
+    worker.start()
+    last_seq = 0
 
+    def update_plot(frame_num):
+        nonlocal last_seq
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
             plt.close(fig)
+            worker.stop()
             cap.release()
             cv2.destroyAllWindows()
+            print(f"丢帧数: {worker.dropped_frames}")
             return lines
 
-        frame_with_roi, (x1, y1, x2, y2) = draw_roi(frame, roi_size=roi_size)
-        roi_frame = frame[y1:y2, x1:x2]
+        _, values, last_seq, _ = worker.buffer.read_since(last_seq)
+        if len(values) == 0:
+            return lines
 
         for i in range(4):
-            # ✅ 将第4个图使用 sign=2
-            sign = i if i < 3 else 2
-            val = cac_k(roi_frame, sign)
-            x_data[i].append(len(x_data[i]))
-            y_data[i].append(val)
-
-            if i == 3 and len(y_data[i]) > 60:
-                y_plot = bandpass_filter(list(y_data[i]), 0.5, 3, 20, 2)
-            else:
-                y_plot = list(y_data[i])
-
-            update_y_axis(axs[i], y_data[i], i)
+            for val in values[:, i]:
+                x_data[i].append(len(x_data[i]))
+                y_data[i].append(val)
+                y_scalers[i].push(val)
+
+            y_scalers[i].update()
             lines[i].set_data(range(len(x_data[i])), y_data[i])
             axs[i].set_xlim(100, max(500, len(x_data[i])))
 
         return lines
-    ani = FuncAnimation(fig, update_plot, blit=True, interval=1000/fps)
+    ani = FuncAnimation(fig, update_plot, blit=True, interval=plot_interval)
     plt.tight_layout()
     plt.show()
+    worker.stop()
 
 if __name__ == "__main__":
     s_DSCA_all(initial_power=150, camera_index=0, fps=60, size=496, roi_size=50)
@@ -0,0 +1,133 @@
+import json
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from camera_source import open_camera
+from exposure_table import EXPOSURE_TABLE_FILE, nominal_exposure_ms
+
+"本程序自动标定相机曝光档位：在光照不变（激光功率固定、目标静止）时逐档设置曝光，测量实际帧间隔与ROI均值；帧间隔受曝光限制的档位给出绝对时长，均值与曝光时间成正比给出其余档位，结果保存为档位-毫秒表供拟合使用"
+
+ExposureMeasurement = namedtuple("ExposureMeasurement", ["exposure", "frame_interval_ms", "mean", "exposure_ms"])
+
+# ROI 均值超出该范围时不用于线性拟合
+MEAN_RANGE = (5, 250)
+
+
+def measure_setting(cap, exposure, roi_size=50, frames=30, settle_frames=10):
+    """
+    :return: (帧间隔中位数 ms, ROI 平均灰度)
+    """
+    cap.set(cv2.CAP_PROP_EXPOSURE, float(exposure))
+    for _ in range(settle_frames):
+        cap.read()
+    timestamps = []
+    means = []
+    for _ in range(frames):
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        timestamps.append(time.perf_counter())
+        height, width = frame.shape[:2]
+        x1 = (width - roi_size) // 2
+        y1 = (height - roi_size) // 2
+        means.append(cv2.mean(frame[y1:y1 + roi_size, x1:x1 + roi_size])[0])
+    if len(timestamps) < 2:
+        return None, None
+    return float(np.median(np.diff(timestamps)) * 1000), float(np.mean(means))
+
+
+def estimate_exposure_ms(exposures, intervals, means, limited_ratio=1.2):
+    """
+    :param limited_ratio: 帧间隔超过最短帧间隔该倍数时，认为帧率受曝光限制，曝光时间约等于帧间隔
+    :return: (各档曝光时间 ms, 线性度 R²)
+    """
+    intervals = np.asarray(intervals, dtype=float)
+    means = np.asarray(means, dtype=float)
+    usable = (means > MEAN_RANGE[0]) & (means < MEAN_RANGE[1])
+    limited = intervals > limited_ratio * np.min(intervals)
+
+    anchors = usable & limited
+    if anchors.sum() >= 2:
+        reference = intervals
+    else:
+        # 没有受曝光限制的档位时只能得到相对比例，绝对值按名义曝光时间对齐
+        print("Warning: 没有帧率受曝光限制的档位，绝对曝光时间按名义值对齐")
+        anchors = usable
+        reference = np.array([nominal_exposure_ms(e) for e in exposures], dtype=float)
+
+    if anchors.sum() >= 2:
+        gain, dark = np.polyfit(reference[anchors], means[anchors], 1)
+        predicted = gain * reference[anchors] + dark
+        residual = np.sum((means[anchors] - predicted) ** 2)
+        total = np.sum((means[anchors] - means[anchors].mean()) ** 2)
+        r2 = 1 - residual / total if total > 0 else 1.0
+    elif anchors.sum() == 1:
+        gain, dark = means[anchors][0] / reference[anchors][0], 0.0
+        r2 = None
+    else:
+        print("Warning: 所有档位均值都过暗或饱和，请调整激光功率后重试")
+        return [None] * len(exposures), None
+
+    exposure_ms = []
+    for idx in range(len(exposures)):
+        if usable[idx]:
+            exposure_ms.append(float((means[idx] - dark) / gain))
+        elif limited[idx]:
+            exposure_ms.append(float(intervals[idx]))
+        else:
+            exposure_ms.append(None)
+    return exposure_ms, r2
+
+
+def characterize_exposures(camera_index, exposures, fps=120, roi_size=50, frames=30, settle_frames=10,
+                           path=EXPOSURE_TABLE_FILE):
+    """
+    逐档测量并保存曝光表
+    :param camera_index: 相机编号（或 camera_source.open_camera 支持的其他来源）
+    :param exposures: 要标定的曝光档位
+    :param fps: 请求的帧率，设高一些使长曝光档位的帧率受曝光限制
+    :return: ExposureMeasurement 列表
+    """
+    cap = open_camera(camera_index)
+    if not cap.isOpened():
+        print("无法打开相机")
+        return []
+    cap.set(cv2.CAP_PROP_FPS, fps)
+
+    intervals = []
+    means = []
+    for exposure in exposures:
+        interval, mean = measure_setting(cap, exposure, roi_size, frames, settle_frames)
+        if interval is None:
+            print(f"曝光 {exposure}: 无法读取图像")
+            cap.release()
+            return []
+        intervals.append(interval)
+        means.append(mean)
+        print(f"曝光 {exposure}: 帧间隔 {interval:.2f} ms，均值 {mean:.2f}")
+    cap.release()
+
+    exposure_ms, r2 = estimate_exposure_ms(exposures, intervals, means)
+    measurements = [ExposureMeasurement(*row) for row in zip(exposures, intervals, means, exposure_ms)]
+    info = {
+        "camera_index": str(camera_index),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "linearity_r2": r2,
+        "table": {str(m.exposure): m.exposure_ms for m in measurements},
+        "frame_interval_ms": {str(m.exposure): m.frame_interval_ms for m in measurements},
+        "mean": {str(m.exposure): m.mean for m in measurements},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    print(f"曝光表已保存到 {path}，线性度 R²={r2}")
+    return measurements
+
+
+if __name__ == "__main__":
+    measurements = characterize_exposures(0, [-7, -6, -5, -4, -3, -2, -1, 0, 1, 2])
+    for m in measurements:
+        ms = "未知" if m.exposure_ms is None else f"{m.exposure_ms:.2f} ms"
+        print(f"曝光 {m.exposure}: {ms}（名义 {nominal_exposure_ms(m.exposure):.2f} ms）")
@@ -0,0 +1,63 @@
+import json
+import os
+
+"本程序管理相机曝光档位与实际曝光时间（ms）的对应表：优先使用 exposure_characterize 实测保存的表，缺失时退回名义值，供拟合、标定与仿真共用"
+
+EXPOSURE_TABLE_FILE = "exposure_table.json"
+
+# m_DSCA 拟合时手工填写的 OpenCV 曝光档位与曝光时间（ms）的对应关系
+DEFAULT_EXPOSURE_TABLE = {-4: 6.25, -3: 12.5, -2: 25, -1: 50, 2: 100}
+
+
+def nominal_exposure_ms(exposure, table=None):
+    """
+    曝光档位 -> 名义曝光时间（ms），表中没有的档位按表自身的刻度推算，结果随档位单调递增：
+    两个表内档位之间按对数线性插值，表外按最近的端点档位每档 2 倍外推（与 OpenCV 每档 2 倍的约定一致，
+    但不使用 2^档位 秒的绝对值，该相机的实际曝光比它小约一个数量级）
+    :param table: 档位 -> ms 的映射，默认 DEFAULT_EXPOSURE_TABLE
+    """
+    table = DEFAULT_EXPOSURE_TABLE if table is None else table
+    if exposure in table:
+        return float(table[exposure])
+    keys = sorted(table)
+    if exposure < keys[0]:
+        return table[keys[0]] * 2.0 ** (exposure - keys[0])
+    if exposure > keys[-1]:
+        return table[keys[-1]] * 2.0 ** (exposure - keys[-1])
+    upper = next(key for key in keys if key > exposure)
+    lower = keys[keys.index(upper) - 1]
+    fraction = (exposure - lower) / (upper - lower)
+    return table[lower] * (table[upper] / table[lower]) ** fraction
+
+
+def load_exposure_table(path=EXPOSURE_TABLE_FILE):
+    """
+    :return: 档位 -> 实测曝光时间（ms），没有实测表时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"曝光表读取失败: {e}")
+        return None
+    return {float(key): value for key, value in info["table"].items() if value is not None}
+
+
+def exposure_ms_for(exposures, fallback=None, path=EXPOSURE_TABLE_FILE):
+    """
+    :param exposures: 曝光档位序列
+    :param fallback: 实测表中没有某档位时使用的曝光时间序列，为 None 时使用名义值
+    :return: 曝光时间序列（ms）
+    """
+    table = load_exposure_table(path) or {}
+    result = []
+    for idx, exposure in enumerate(exposures):
+        if float(exposure) in table:
+            result.append(table[float(exposure)])
+        elif fallback is not None:
+            result.append(fallback[idx])
+        else:
+            result.append(nominal_exposure_ms(exposure))
+    return result
@@ -0,0 +1,153 @@
+import time
+
+import cv2
+import numpy as np
+
+"本程序为灰度采集路径：让 OpenCV 跳过 RGB 转换直接返回相机原始缓冲，YUYV 格式取 Y 平面（零拷贝视图，后续只复制ROI行），MJPG 格式用 IMREAD_GRAYSCALE 只解码亮度分量，并统计每帧解码 CPU 时间，与默认的 BGR 解码 + 转灰度对比"
+
+MODE_YUYV = "yuyv"
+MODE_MJPG = "mjpg"
+MODE_BGR = "bgr"  # 后端不支持原始缓冲时退回 BGR 解码后转灰度
+MODE_GRAY = "gray"  # 相机已直接返回灰度帧（仿真/回放相机）
+
+
+def yuyv_luma(raw, width, height):
+    """
+    :param raw: YUYV 原始缓冲（任意形状，共 width*height*2 字节）
+    :return: (height, width) 的 Y 平面视图，不复制数据
+    """
+    return raw.reshape(height, width, 2)[:, :, 0]
+
+
+def decode_gray(raw, mode, width, height):
+    """
+    :param raw: cap.read() 在 CONVERT_RGB=0 时返回的缓冲
+    :param mode: MODE_YUYV / MODE_MJPG / MODE_BGR / MODE_GRAY
+    :return: 灰度图，解码失败时返回 None
+    """
+    if mode == MODE_YUYV:
+        return yuyv_luma(raw, width, height)
+    if mode == MODE_MJPG:
+        return cv2.imdecode(raw.reshape(-1), cv2.IMREAD_GRAYSCALE)
+    if mode == MODE_GRAY:
+        return raw
+    return cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY)
+
+
+class GrayCapture:
+    def __init__(self, cap, pixelformat="YUYV"):
+        """
+        包装已打开的相机，read() 返回单通道灰度图
+        :param cap: 相机对象（cv2.VideoCapture、仿真或回放相机）
+        :param pixelformat: "YUYV" 或 "MJPG"；YUYV 省去 JPEG 解码，但 USB2 带宽限制了高分辨率下的帧率
+        """
+        self.cap = cap
+        self.pixelformat = pixelformat
+        self.mode = None
+        self.width = None
+        self.height = None
+        self.decode_cpu_ms = None  # 每帧解码 CPU 时间（ms）的指数平均
+        if hasattr(cap, "set"):
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*pixelformat))
+            cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+    def _detect(self, raw):
+        """根据第一帧缓冲的形状判断后端实际返回的格式"""
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
+        if raw.ndim == 3 and raw.shape[2] == 3:
+            self.mode = MODE_BGR
+            self.height, self.width = raw.shape[:2]
+        elif raw.ndim == 3 and raw.shape[2] == 2:
+            self.mode = MODE_YUYV
+            self.height, self.width = raw.shape[:2]
+        elif self.width and self.height and raw.size == 2 * self.width * self.height:
+            self.mode = MODE_YUYV
+        elif raw.ndim == 2 and raw.shape[0] > 1:
+            # 已是灰度图（仿真/回放相机在 CONVERT_RGB=0 时直接返回灰度）
+            self.mode = MODE_GRAY
+            self.height, self.width = raw.shape
+        else:
+            self.mode = MODE_MJPG
+        print(f"灰度采集模式: {self.mode}")
+
+    def read(self):
+        ret, raw = self.cap.read()
+        if not ret:
+            return False, None
+        if self.mode is None:
+            self._detect(raw)
+        start = time.thread_time()
+        gray = decode_gray(raw, self.mode, self.width, self.height)
+        elapsed = (time.thread_time() - start) * 1000
+        self.decode_cpu_ms = elapsed if self.decode_cpu_ms is None else 0.95 * self.decode_cpu_ms + 0.05 * elapsed
+        if gray is None:
+            return False, None
+        return True, gray
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+def _cpu_per_frame(func, frames):
+    start = time.thread_time()
+    for frame in frames:
+        func(frame)
+    return (time.thread_time() - start) / len(frames) * 1000
+
+
+def compare_decode_cost(gray_frames, roi=None, quality=90):
+    """
+    用同一组灰度帧构造 MJPG 与 YUYV 缓冲，比较默认路径与灰度路径每帧的 CPU 时间
+    :param gray_frames: 灰度帧序列
+    :param roi: (x1, y1, x2, y2)，统计只取该区域，与 cac_k 的用法一致
+    :return: {格式: (默认路径 ms, 灰度路径 ms)}
+    """
+    height, width = gray_frames[0].shape
+    x1, y1, x2, y2 = roi if roi is not None else (0, 0, width, height)
+    results = {}
+
+    jpegs = [cv2.imencode(".jpg", cv2.cvtColor(g, cv2.COLOR_GRAY2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])[1]
+             for g in gray_frames]
+    default_mjpg = _cpu_per_frame(
+        lambda buf: cv2.meanStdDev(cv2.cvtColor(cv2.imdecode(buf, cv2.IMREAD_COLOR)[y1:y2, x1:x2],
+                                                cv2.COLOR_BGR2GRAY)), jpegs)
+    gray_mjpg = _cpu_per_frame(
+        lambda buf: cv2.meanStdDev(cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)[y1:y2, x1:x2]), jpegs)
+    results[MODE_MJPG] = (default_mjpg, gray_mjpg)
+
+    yuyv = []
+    for g in gray_frames:
+        raw = np.full((height, width, 2), 128, dtype=np.uint8)
+        raw[:, :, 0] = g
+        yuyv.append(raw)
+    default_yuyv = _cpu_per_frame(
+        lambda raw: cv2.meanStdDev(cv2.cvtColor(cv2.cvtColor(raw, cv2.COLOR_YUV2BGR_YUYV)[y1:y2, x1:x2],
+                                                cv2.COLOR_BGR2GRAY)), yuyv)
+    # Y 平面是步长为 2 的视图，切片后只复制ROI内的像素
+    gray_yuyv = _cpu_per_frame(
+        lambda raw: cv2.meanStdDev(np.ascontiguousarray(yuyv_luma(raw, width, height)[y1:y2, x1:x2])), yuyv)
+    results[MODE_YUYV] = (default_yuyv, gray_yuyv)
+    return results
+
+
+if __name__ == "__main__":
+    # 以仿真散斑帧估计 496x496、100x100 ROI 下每帧节省的 CPU 时间
+    from speckle_sim import SpeckleSimulator
+
+    sim = SpeckleSimulator(size=496, seed=0)
+    frames = [sim.generate() for _ in range(60)]
+    for roi in (None, (198, 198, 298, 298)):
+        label = "整帧" if roi is None else "100x100 ROI"
+        for mode, (default_ms, gray_ms) in compare_decode_cost(frames, roi).items():
+            print(f"{mode} {label}: BGR 路径 {default_ms:.2f} ms/帧，灰度路径 {gray_ms:.2f} ms/帧，"
+                  f"节省 {default_ms - gray_ms:.2f} ms/帧（{(1 - gray_ms / default_ms) * 100:.0f}%）")
@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+
+from laser_protocol import (CMD_POWER, CMD_SET_POWER, CMD_SWITCH, SWITCH_ON, FrameParser, encode_command)
+
+"本程序为基于 asyncio 的激光器驱动：后台任务持续读取串口并按帧切分应答，查询指令按应答类型与等待中的请求匹配，功率调节带截止时间，调节期间采集循环可继续运行"
+
+
+class AsyncLaser:
+    def __init__(self, serial_port=None, late_window=0.1):
+        """
+        :param serial_port: 已打开的串口对象（可传入仿真串口），为 None 时需调用 open()
+        :param late_window: 查询超时后继续等待迟到应答的时间（秒），期间到达的同类应答被丢弃
+        """
+        self.serial_port = serial_port
+        self.parser = FrameParser()
+        self.power_setpoint = None  # 最近一次下发的功率设定值
+        self.timeouts = 0  # 查询超时次数
+        self.unmatched = 0  # 没有对应请求的应答数
+        self.late_replies = 0  # 查询超时后才到达、被丢弃的应答数
+        self.late_window = late_window
+        self._pending = {}  # 指令码 -> 等待应答的 future 队列
+        self._reader = None
+        self._executor = ThreadPoolExecutor(max_workers=1)  # 阻塞读串口的专用线程
+        self._running = False
+
+    def open(self, port_name, baudrate=9600):
+        """打开串口，短超时使读线程能及时退出"""
+        try:
+            self.serial_port = serial.Serial(port=port_name, baudrate=baudrate, bytesize=8, parity='N',
+                                             stopbits=1, timeout=0.05)
+            print(f"成功打开串口: {port_name}")
+            return True
+        except Exception as e:
+            print(f"打开串口失败: {e}")
+            return False
+
+    async def start(self):
+        self._running = True
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def stop(self):
+        self._running = False
+        if self._reader is not None:
+            await self._reader
+            self._reader = None
+        for queue in self._pending.values():
+            for future in queue:
+                future.cancel()
+        self._pending.clear()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self.serial_port and self.serial_port.is_open:
+            self.serial_port.close()
+            print("串口已关闭")
+
+    def _read_chunk(self):
+        try:
+            return self.serial_port.read(max(1, self.serial_port.in_waiting))
+        except Exception as e:
+            print(f"读取数据失败: {e}")
+            time.sleep(0.05)
+            return b""
+
+    async def _read_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            data = await loop.run_in_executor(self._executor, self._read_chunk)
+            if data:
+                for response in self.parser.feed(data):
+                    self._dispatch(response)
+
+    def _dispatch(self, response):
+        queue = self._pending.get(response.key)
+        if not queue:
+            self.unmatched += 1
+            return
+        future = queue.popleft()
+        if future.done():
+            # 应答按查询顺序返回，队首已超时的查询仍在等待窗口内：这是它的迟到应答，丢弃而不交给下一条同类查询
+            self.late_replies += 1
+            return
+        future.set_result(response)
+
+    def send(self, cmd, value=0):
+        """只发送不等待应答（设置类指令）"""
+        try:
+            self.serial_port.write(encode_command(cmd, value))
+        except Exception as e:
+            print(f"发送数据失败: {e}")
+
+    async def query(self, cmd, timeout=0.5):
+        """
+        发送查询指令并等待同类型应答
+        :param cmd: 指令码
+        :param timeout: 超时（秒）
+        :return: 解析值，超时返回 None
+        """
+        response = await self.request(cmd, timeout)
+        return None if response is None else response.value
+
+    async def request(self, cmd, timeout=0.5):
+        """
+        与 query 相同，但返回完整的 Response
+        超时后请求在队列中再保留 late_window 秒，期间到达的同类应答视为它的迟到应答并丢弃，之后才返回
+        """
+        future = asyncio.get_running_loop().create_future()
+        queue = self._pending.setdefault(cmd, deque())
+        queue.append(future)
+        self.send(cmd)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            await asyncio.sleep(self.late_window)
+            if future in queue:
+                queue.remove(future)
+            return None
+
+    def set_power(self, power):
+        """设置激光器功率（1~600）"""
+        power = int(min(max(power, 1), 600))
+        self.send(CMD_SET_POWER, power)
+        self.power_setpoint = power
+        return power
+
+    def laser_on(self):
+        self.send(CMD_SWITCH, SWITCH_ON)
+
+    def laser_off(self):
+        self.send(CMD_SWITCH, 0)
+
+    async def set_power_state(self, power, tolerance=5, deadline=3.0, poll_interval=0.05):
+        """
+        设置功率并轮询读数直到误差不超过 tolerance
+        :param deadline: 最长等待时间（秒）
+        :param poll_interval: 读数间隔（秒）
+        :return: 截止时间内是否到达目标功率
+        """
+        power = self.set_power(power)
+        start = time.perf_counter()
+        end = start + deadline
+        current_power = None
+        while time.perf_counter() < end:
+            await asyncio.sleep(poll_interval)
+            current_power = await self.query(CMD_POWER, timeout=min(0.5, max(end - time.perf_counter(), 0.01)))
+            if isinstance(current_power, (int, float)) and abs(current_power - power) <= tolerance:
+                print(f"功率设置成功: 目标功率 {power}, 当前功率 {current_power}, 耗时 {time.perf_counter() - start:.2f} s")
+                return True
+        print(f"功率设置超时: 目标功率 {power}, 当前功率 {current_power}")
+        return False
+
+
+class LaserThread:
+    def __init__(self, laser):
+        """
+        在后台线程中运行 AsyncLaser 的事件循环，供同步代码（采集循环、Qt 界面）调用
+        :param laser: AsyncLaser 对象，串口需已打开
+        """
+        self.laser = laser
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.submit(laser.start()).result()
+
+    @property
+    def power_setpoint(self):
+        return self.laser.power_setpoint
+
+    def submit(self, coro):
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def set_power_state(self, power, tolerance=5, deadline=3.0):
+        """
+        立即返回 Future，result() 为是否在截止时间内到达目标功率
+        """
+        return self.submit(self.laser.set_power_state(power, tolerance, deadline))
+
+    def query(self, cmd, timeout=0.5):
+        """阻塞查询，返回解析值或 None"""
+        return self.submit(self.laser.query(cmd, timeout)).result()
+
+    def set_power(self, power):
+        self.loop.call_soon_threadsafe(self.laser.set_power, power)
+
+    def laser_on(self):
+        self.loop.call_soon_threadsafe(self.laser.laser_on)
+
+    def laser_off(self):
+        self.loop.call_soon_threadsafe(self.laser.laser_off)
+
+    def close(self):
+        self.submit(self.laser.stop()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.laser.close()
+
+
+if __name__ == "__main__":
+    port_name = "COM6"
+    laser = AsyncLaser()
+    if laser.open(port_name):
+        driver = LaserThread(laser)
+        driver.laser_on()
+        pending = driver.set_power_state(200)
+        # 功率调节进行中，调用方可以继续做别的事情
+        while not pending.done():
+            time.sleep(0.01)
+        print(f"功率调节结果: {pending.result()}，当前功率 {driver.query(CMD_POWER)} mW")
+        driver.laser_off()
+        driver.close()
@@ -0,0 +1,156 @@
+from collections import namedtuple
+
+import numpy as np
+
+from exposure_table import nominal_exposure_ms
+
+"本程序为激光功率标定引擎：把 ROI 均值近似为 功率×曝光时间 的线性函数，用已有测量预测每个曝光的目标功率，再在上下界内用割线/二分细化，多数曝光 1~2 次写功率即可满足均值窗口"
+
+CalibrationStep = namedtuple("CalibrationStep", ["exposure", "power", "mean", "writes", "converged"])
+
+# 超过该灰度视为接近饱和，不参与线性模型拟合
+SATURATION_MEAN = 250
+
+
+class PowerCalibrator:
+    def __init__(self, k_min, k_max, power_min=10, power_max=500, max_writes=8, power_step=1):
+        """
+        :param k_min: ROI 均值下限
+        :param k_max: ROI 均值上限
+        :param power_min: 功率下限
+        :param power_max: 功率上限
+        :param max_writes: 每个曝光最多写功率的次数
+        :param power_step: 激光器功率的最小调节步长
+        """
+        self.k_min = k_min
+        self.k_max = k_max
+        self.target = (k_min + k_max) / 2
+        self.power_min = power_min
+        self.power_max = power_max
+        self.max_writes = max_writes
+        self.power_step = power_step
+        self.samples = []  # (功率×曝光时间, 均值)
+
+    def _clamp(self, power):
+        power = int(round(power / self.power_step) * self.power_step)
+        return int(min(max(power, self.power_min), self.power_max))
+
+    def add_sample(self, power, exposure_ms, mean):
+        if mean < SATURATION_MEAN:
+            self.samples.append((power * exposure_ms, mean))
+
+    def model(self):
+        """
+        最小二乘拟合 均值 = a × 功率×曝光 + b
+        :return: (a, b)，没有样本时返回 None；只有一种功率×曝光时取 b=0
+        """
+        if not self.samples:
+            return None
+        x, y = np.array(self.samples, dtype=float).T
+        if np.ptp(x) <= 0:
+            return y.mean() / max(x.mean(), 1e-12), 0.0
+        a, b = np.polyfit(x, y, 1)
+        if a <= 0:
+            return y.mean() / max(x.mean(), 1e-12), 0.0
+        return a, b
+
+    def predict(self, exposure_ms, fallback):
+        """按线性模型预测某曝光下使均值落在窗口中心的功率"""
+        model = self.model()
+        if model is None:
+            return self._clamp(fallback)
+        a, b = model
+        return self._clamp((self.target - b) / (a * exposure_ms))
+
+    def _next_power(self, history, exposure_ms, low, high):
+        """
+        :param history: 本曝光已测的 (功率, 均值)
+        :param low: 已知均值偏低的最大功率
+        :param high: 已知均值偏高的最小功率
+        """
+        (p1, m1) = history[-1]
+        guess = None
+        if len(history) >= 2:
+            p0, m0 = history[-2]
+            if p1 != p0 and m1 != m0 and m1 < SATURATION_MEAN and m0 < SATURATION_MEAN:
+                guess = p1 + (self.target - m1) * (p1 - p0) / (m1 - m0)
+        if guess is None:
+            model = self.model()
+            slope = model[0] * exposure_ms if model is not None else None
+            if slope and m1 < SATURATION_MEAN:
+                guess = p1 + (self.target - m1) / slope
+            else:
+                guess = p1 / 2 if m1 > self.k_max else p1 * 2
+        # 预测值落在上下界之外时退化为二分
+        lo = low if low is not None else self.power_min
+        hi = high if high is not None else self.power_max
+        if not lo < guess < hi and low is not None and high is not None:
+            guess = (lo + hi) / 2
+        return self._clamp(guess)
+
+    def calibrate_exposure(self, exposure, exposure_ms, set_power, measure, initial_power):
+        """
+        :param set_power: set_power(power)，写入功率并等待生效
+        :param measure: measure() -> 当前 ROI 均值
+        :param initial_power: 没有模型时的起始功率
+        :return: CalibrationStep
+        """
+        power = self.predict(exposure_ms, initial_power)
+        history = []
+        low = high = None
+        for writes in range(1, self.max_writes + 1):
+            set_power(power)
+            mean = measure()
+            self.add_sample(power, exposure_ms, mean)
+            history.append((power, mean))
+            if self.k_min <= mean <= self.k_max:
+                return CalibrationStep(exposure, power, mean, writes, True)
+            if mean < self.k_min:
+                low = power if low is None else max(low, power)
+            else:
+                high = power if high is None else min(high, power)
+            next_power = self._next_power(history, exposure_ms, low, high)
+            if next_power == power or (low is not None and high is not None and high - low <= self.power_step):
+                break
+            power = next_power
+        power, mean = min(history, key=lambda item: abs(item[1] - self.target))
+        return CalibrationStep(exposure, power, mean, writes, False)
+
+
+if __name__ == "__main__":
+    # 合成相机（均值与 功率×曝光 成正比，带暗电平、噪声与饱和）对比原先 ±10 mW 步进的写功率次数
+    rng = np.random.default_rng(0)
+    exposures = [-4, -3, -2, -1, 2]
+    exposures_ms = [nominal_exposure_ms(e) for e in exposures]
+    k_min, k_max = 80, 120
+    current = {"power": 200, "exposure_ms": exposures_ms[0]}
+
+    def measure():
+        mean = 0.04 * current["power"] * current["exposure_ms"] + 5 + rng.normal(0, 1)
+        return min(mean, 255.0)
+
+    def set_power(power):
+        current["power"] = power
+
+    calibrator = PowerCalibrator(k_min, k_max)
+    new_writes = []
+    for exposure, exposure_ms in zip(exposures, exposures_ms):
+        current["exposure_ms"] = exposure_ms
+        step = calibrator.calibrate_exposure(exposure, exposure_ms, set_power, measure, current["power"])
+        new_writes.append(step.writes)
+        print(f"曝光 {exposure}: 功率 {step.power}，均值 {step.mean:.1f}，写功率 {step.writes} 次")
+
+    old_writes = []
+    power = 200
+    for exposure_ms in exposures_ms:
+        current["exposure_ms"] = exposure_ms
+        writes = 0
+        while True:
+            current["power"] = power
+            mean = measure()
+            if k_min <= mean <= k_max or writes > 100:
+                break
+            power = min(max(power - 10 if mean > k_max else power + 10, 10), 500)
+            writes += 1
+        old_writes.append(writes)
+    print(f"写功率次数: 新方法 {new_writes}（共 {sum(new_writes)}），±10 mW 步进 {old_writes}（共 {sum(old_writes)}）")
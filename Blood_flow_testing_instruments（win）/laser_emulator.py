@@ -0,0 +1,200 @@
+import math
+import os
+import random
+import select
+import threading
+import time
+
+from laser_protocol import (CMD_LD_CURRENT, CMD_POWER, CMD_SET_POWER, CMD_SWITCH, CMD_TEC_CURRENT,
+                            CMD_TEC_TEMPERATURE, CMD_VERSION, FRAME_HEAD, FRAME_TAIL, encode_closed_reply,
+                            encode_value_reply, encode_version_reply)
+
+try:
+    import tty
+except ImportError:  # Windows 没有伪终端
+    tty = None
+
+"本程序为激光器串口仿真：在伪终端上按 ComSetting 的字节协议应答，功率按一阶过程趋近设定值，可设置应答延迟与丢帧、乱码概率，用于在任意 Linux 机器上压测功率调节、标定与串口吞吐"
+
+
+class LaserEmulator:
+    def __init__(self, settle_time=0.15, latency=0.005, jitter=0.002, drop_probability=0.0,
+                 garble_probability=0.0, version=(1, 3), tec_temperature=25.0, seed=None):
+        """
+        :param settle_time: 功率一阶响应的时间常数（秒）
+        :param latency: 应答延迟（秒）
+        :param jitter: 应答延迟的随机抖动（秒）
+        :param drop_probability: 应答丢失的概率
+        :param garble_probability: 应答中某一字节被改写的概率
+        :param version: 固件版本号 (主, 次)
+        :param tec_temperature: TEC 温度（°C）
+        """
+        self.settle_time = settle_time
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_probability = drop_probability
+        self.garble_probability = garble_probability
+        self.version = version
+        self.tec_temperature = tec_temperature
+        self.rng = random.Random(seed)
+        self.laser_on = False
+        self.setpoint = 0.0
+        self._power_start = 0.0  # 最近一次设定时的输出功率
+        self._set_time = time.perf_counter()
+        self.commands = 0
+        self.dropped = 0
+        self.garbled = 0
+        self.master = None
+        self.slave = None
+        self.port_name = None
+        self._running = False
+        self._thread = None
+
+    def output_power(self):
+        """当前实际输出功率（mW），可作为 SpeckleSimulator 的 power_source"""
+        target = self.setpoint if self.laser_on else 0.0
+        elapsed = time.perf_counter() - self._set_time
+        return target + (self._power_start - target) * math.exp(-elapsed / self.settle_time)
+
+    def _set_target(self, power, laser_on):
+        self._power_start = self.output_power()
+        self._set_time = time.perf_counter()
+        self.setpoint = power
+        self.laser_on = laser_on
+
+    def start(self):
+        """
+        打开伪终端并启动应答线程
+        :return: 从端设备名，可直接传给 ComSetting.init_serial / AsyncLaser.open
+        """
+        if tty is None:
+            print("当前平台不支持伪终端")
+            return None
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self.port_name
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def _serve(self):
+        buffer = bytearray()
+        while self._running:
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            buffer.extend(os.read(self.master, 256))
+            while len(buffer) >= 7:
+                if buffer[0] != FRAME_HEAD:
+                    del buffer[0]
+                    continue
+                frame = bytes(buffer[:7])
+                if frame[6] != FRAME_TAIL:
+                    del buffer[0]
+                    continue
+                del buffer[:7]
+                self._handle(frame)
+
+    def _handle(self, frame):
+        self.commands += 1
+        cmd = frame[2]
+        value = (frame[3] << 8) | frame[4]
+        reply = None
+        if cmd == CMD_SWITCH:
+            self._set_target(self.setpoint, value != 0)
+            if value == 0:
+                reply = encode_closed_reply()
+        elif cmd == CMD_SET_POWER:
+            self._set_target(value, self.laser_on)
+        elif cmd == CMD_VERSION:
+            reply = encode_version_reply(*self.version)
+        elif cmd == CMD_POWER:
+            reply = encode_value_reply(CMD_POWER, self.output_power())
+        elif cmd == CMD_TEC_TEMPERATURE:
+            reply = encode_value_reply(CMD_TEC_TEMPERATURE, self.tec_temperature * 100)
+        elif cmd == CMD_TEC_CURRENT:
+            reply = encode_value_reply(CMD_TEC_CURRENT, 300 + 2 * self.output_power())
+        elif cmd == CMD_LD_CURRENT:
+            reply = encode_value_reply(CMD_LD_CURRENT, 50 + 1.5 * self.output_power())
+        if reply is None:
+            return
+
+        if self.rng.random() < self.drop_probability:
+            self.dropped += 1
+            return
+        if self.rng.random() < self.garble_probability:
+            reply = bytearray(reply)
+            reply[self.rng.randrange(len(reply))] = self.rng.randrange(256)
+            self.garbled += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        os.write(self.master, bytes(reply))
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from laser_async import AsyncLaser, LaserThread
+    from leaser_control import ComSetting
+    from speckle_sim import SpeckleSimulator
+
+    emulator = LaserEmulator(settle_time=0.15, latency=0.005, drop_probability=0.02, garble_probability=0.02, seed=0)
+    port_name = emulator.start()
+    steps = [100, 300, 150, 500, 200]
+
+    # 1. 同步 ComSetting：每次 read(16) 要等满串口超时
+    controller = ComSetting()
+    controller.init_serial(port_name, timeout=0.1)
+    controller.send_data(controller.open_cmd)
+    start = time.perf_counter()
+    for power in steps:
+        controller.set_power_state(power)
+    sync_time = (time.perf_counter() - start) / len(steps)
+
+    # 2. 异步驱动：按帧切分应答，不等待超时
+    driver = LaserThread(AsyncLaser(controller.serial_port))
+    start = time.perf_counter()
+    results = [driver.set_power_state(power).result() for power in steps]
+    async_time = (time.perf_counter() - start) / len(steps)
+
+    # 3. 串口吞吐：并发查询（关闭丢帧与乱码，避免超时等待计入耗时）
+    faults = emulator.drop_probability, emulator.garble_probability
+    emulator.drop_probability = emulator.garble_probability = 0.0
+    async def burst(n):
+        return await asyncio.gather(*(driver.laser.query(CMD_TEC_TEMPERATURE, 5.0) for _ in range(n)))
+
+    n = 200
+    start = time.perf_counter()
+    replies = driver.submit(burst(n)).result()
+    elapsed = time.perf_counter() - start
+    answered = sum(r is not None for r in replies)
+    emulator.drop_probability, emulator.garble_probability = faults
+
+    # 4. 标定收敛：仿真相机光强随仿真激光功率变化
+    camera = SpeckleSimulator(size=200, heart_rate=0, mean_intensity=100, ref_exposure_ms=25, ref_power=100,
+                              power_source=emulator.output_power, seed=0)
+    driver.close()
+    controller.init_serial(port_name, timeout=0.1)
+    start = time.perf_counter()
+    powers = controller.leaser_calibration(80, 120, [-4, -3, -2, -1, 2], camera, initial_power=200, show=False)
+    calibration_time = time.perf_counter() - start
+
+    print(f"set_power_state 同步: {sync_time:.2f} s/次，异步: {async_time:.2f} s/次，成功 {sum(results)}/{len(results)}")
+    print(f"并发查询 {n} 条: {answered / elapsed:.0f} 条/s，应答 {answered}；全程丢帧 {emulator.dropped}，乱码 {emulator.garbled}，"
+          f"驱动重新同步丢弃 {driver.laser.parser.dropped_bytes} 字节")
+    print(f"标定: {calibration_time:.1f} s，功率序列 {powers}")
+    controller.close_serial()
+    emulator.stop()
@@ -0,0 +1,117 @@
+from collections import namedtuple
+
+"本程序定义激光器串口协议：指令帧 aa 00 cmd hi lo chk 8e 的编码，以及从字节流中切分 0x82/0x83/0x84 应答帧，供同步与异步驱动及激光器仿真共用"
+
+FRAME_HEAD = 0xaa
+FRAME_TAIL = 0x8e
+
+# 指令码
+CMD_SWITCH = 0x00  # 开关激光，数据 SWITCH_ON 为开、0 为关
+CMD_SET_POWER = 0x01  # 设置功率
+CMD_VERSION = 0x02  # 版本号
+CMD_POWER = 0x03  # 功率
+CMD_PARAM = 0x06  # 激光状态
+CMD_TEC_TEMPERATURE = 0x0e  # TEC 温度
+CMD_TEC_CURRENT = 0x0f  # TEC 电流
+CMD_LD_CURRENT = 0x10  # LD 电流
+
+SWITCH_ON = 0x0100  # 与 ComSetting.open_cmd 一致，高字节为 1
+
+# 应答帧头
+REPLY_CLOSED = 0x82
+REPLY_VALUE = 0x83
+REPLY_VERSION = 0x84
+# 各应答帧的总长度（含帧头与帧尾），帧尾必须恰好在该位置
+_REPLY_LENGTH = {REPLY_CLOSED: 2, REPLY_VALUE: 6, REPLY_VERSION: 4}
+
+Response = namedtuple("Response", ["key", "value", "raw"])
+
+
+def encode_command(cmd, value=0):
+    """
+    :param cmd: 指令码
+    :param value: 数据，高低字节按 256 进制拆分（与 ComSetting.set_power 一致）
+    :return: 7 字节指令帧
+    """
+    high_byte = (value >> 8) & 0xFF
+    low_byte = value & 0xFF
+    checksum = cmd ^ high_byte ^ low_byte
+    return bytes([FRAME_HEAD, 0x00, cmd, high_byte, low_byte, checksum, FRAME_TAIL])
+
+
+def encode_value_reply(code, value):
+    """
+    0x83 应答帧（激光器仿真用）：83 code hi lo chk 8e，数据按 255 进制拆分
+    """
+    value = int(min(max(round(value), 0), 255 * 255 - 1))
+    high_byte, low_byte = divmod(value, 255)
+    return bytes([REPLY_VALUE, code, high_byte, low_byte, code ^ high_byte ^ low_byte, FRAME_TAIL])
+
+
+def encode_version_reply(major, minor):
+    return bytes([REPLY_VERSION, major, minor, FRAME_TAIL])
+
+
+def encode_closed_reply():
+    return bytes([REPLY_CLOSED, FRAME_TAIL])
+
+
+def decode_value(high_byte, low_byte):
+    """应答数据按 255 进制还原（与 ComSetting.read_data 一致）"""
+    return high_byte * 255 + low_byte
+
+
+def parse_frame(frame):
+    """
+    :param frame: 以应答帧头开头、以 0x8e 结尾的完整帧
+    :return: Response(对应的查询指令码, 解析值, 原始字节)，无法识别、长度不符或校验错误时返回 None
+    """
+    head = frame[0]
+    if len(frame) != _REPLY_LENGTH.get(head) or frame[-1] != FRAME_TAIL:
+        return None
+    if head == REPLY_VERSION:
+        return Response(CMD_VERSION, f"{frame[1]}.{frame[2]}", bytes(frame))
+    if head == REPLY_CLOSED:
+        return Response(CMD_SWITCH, "Laser closed", bytes(frame))
+    if head == REPLY_VALUE:
+        code = frame[1]
+        if frame[4] != code ^ frame[2] ^ frame[3]:
+            return None
+        value = decode_value(frame[2], frame[3])
+        if code == CMD_TEC_TEMPERATURE:
+            value = value / 100.0
+        return Response(code, value, bytes(frame))
+    return None
+
+
+class FrameParser:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.dropped_bytes = 0  # 重新同步时丢弃的字节数
+
+    def feed(self, data):
+        """
+        追加接收到的字节并切出所有完整的应答帧，一次读到半帧或多帧都可处理
+        :return: Response 列表
+        """
+        self.buffer.extend(data)
+        responses = []
+        while self.buffer:
+            length = _REPLY_LENGTH.get(self.buffer[0])
+            if length is None:
+                self._drop(1)
+                continue
+            if len(self.buffer) < length:
+                break
+            response = parse_frame(self.buffer[:length])
+            if response is None:
+                # 帧尾不在固定位置或校验错误，视为乱码，从下一字节重新同步
+                self._drop(1)
+                continue
+            del self.buffer[:length]
+            responses.append(response)
+        return responses
+
+    def _drop(self, n):
+        del self.buffer[:n]
+        self.dropped_bytes += n
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from laser_protocol import CMD_LD_CURRENT, CMD_POWER, CMD_TEC_CURRENT, CMD_TEC_TEMPERATURE, CMD_VERSION
+
+"本程序为激光器遥测服务：在异步驱动的事件循环中周期性并发下发版本、功率、TEC 温度、TEC 电流、LD 电流查询，读数带时间戳存入环形缓存，绘图、录制与标定直接读取最新值而不占用串口"
+
+TELEMETRY_QUERIES = {
+    "version": CMD_VERSION,
+    "power": CMD_POWER,
+    "tec_temperature": CMD_TEC_TEMPERATURE,
+    "tec_current": CMD_TEC_CURRENT,
+    "ld_current": CMD_LD_CURRENT,
+}
+
+Reading = namedtuple("Reading", ["timestamp", "value"])
+
+
+class LaserTelemetry:
+    def __init__(self, driver, interval=0.2, history=256, timeout=0.5, queries=None):
+        """
+        :param driver: laser_async.LaserThread
+        :param interval: 一轮查询的周期（秒）
+        :param history: 每个量保留的读数个数
+        :param timeout: 单条查询超时（秒）
+        :param queries: 名称 -> 指令码，默认 TELEMETRY_QUERIES
+        """
+        self.driver = driver
+        self.interval = interval
+        self.timeout = timeout
+        self.queries = TELEMETRY_QUERIES if queries is None else queries
+        # 只在事件循环线程追加，其他线程只读末尾元素
+        self.readings = {name: deque(maxlen=history) for name in self.queries}
+        self.latencies = {name: deque(maxlen=history) for name in self.queries}
+        self.timeouts = {name: 0 for name in self.queries}
+        self.rounds = 0
+        self._running = False
+        self._task = None
+
+    def start(self):
+        self._running = True
+        self._task = self.driver.submit(self._poll_loop())
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.result()
+            self._task = None
+
+    async def _poll_loop(self):
+        while self._running:
+            start = time.perf_counter()
+            # 各查询的应答类型不同，可同时在途，一轮耗时约为最慢的一条
+            await asyncio.gather(*(self._poll_one(name, cmd) for name, cmd in self.queries.items()))
+            self.rounds += 1
+            await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - start)))
+
+    async def _poll_one(self, name, cmd):
+        start = time.perf_counter()
+        value = await self.driver.laser.query(cmd, self.timeout)
+        now = time.perf_counter()
+        if value is None:
+            self.timeouts[name] += 1
+            return
+        self.latencies[name].append(now - start)
+        self.readings[name].append(Reading(now, value))
+
+    def latest(self, name, max_age=None):
+        """
+        :param name: 量的名称，见 TELEMETRY_QUERIES
+        :param max_age: 不为 None 时读数超过该时长（秒）视为无效
+        :return: Reading(时间戳, 值)，没有有效读数时返回 None
+        """
+        readings = self.readings[name]
+        if not readings:
+            return None
+        reading = readings[-1]
+        if max_age is not None and time.perf_counter() - reading.timestamp > max_age:
+            return None
+        return reading
+
+    def history(self, name):
+        """:return: (时间戳数组, 值列表)"""
+        readings = list(self.readings[name])
+        return np.array([r.timestamp for r in readings]), [r.value for r in readings]
+
+    def latency_summary(self):
+        """:return: 名称 -> (应答次数, 平均往返毫秒, p95 毫秒, 最大毫秒, 超时次数)"""
+        summary = {}
+        for name, values in self.latencies.items():
+            if values:
+                ms = np.array(values) * 1000
+                summary[name] = (len(ms), float(ms.mean()), float(np.percentile(ms, 95)), float(ms.max()), self.timeouts[name])
+            else:
+                summary[name] = (0, 0.0, 0.0, 0.0, self.timeouts[name])
+        return summary
+
+
+if __name__ == "__main__":
+    from laser_async import AsyncLaser, LaserThread
+
+    port_name = "COM6"
+    laser = AsyncLaser()
+    if laser.open(port_name):
+        driver = LaserThread(laser)
+        telemetry = LaserTelemetry(driver)
+        telemetry.start()
+        try:
+            while True:
+                time.sleep(1)
+                for name in telemetry.queries:
+                    reading = telemetry.latest(name)
+                    print(f"{name}: {None if reading is None else reading.value}", end="  ")
+                print()
+        except KeyboardInterrupt:
+            pass
+        telemetry.stop()
+        for name, (count, mean, p95, worst, timeouts) in telemetry.latency_summary().items():
+            print(f"{name}: {count} 次，平均 {mean:.1f} ms，p95 {p95:.1f} ms，最大 {worst:.1f} ms，超时 {timeouts} 次")
+        driver.close()
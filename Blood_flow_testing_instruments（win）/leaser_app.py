@@ -6,6 +6,9 @@ from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QPixmap
 from PyQt5.uic import loadUi
 
+from laser_async import AsyncLaser, LaserThread
+from laser_telemetry import LaserTelemetry
+
 APP_VERSION = "V1.2"
 "用python重写的激光器控制程序，主要是为了分解串口命令，为leaser_control程序提供基础"
 
@@ -17,6 +20,8 @@ class FringeSetting(QMainWindow):
 
         self.setWindowTitle(f"IMAI HPL Controller {APP_VERSION}")
         self.serial_port = None
+        self.driver = None  # 后台串口驱动
+        self.telemetry = None  # 后台遥测，界面只读缓存
         self.timer = QTimer(self)
 
         self.open = "aa00000100018e"
@@ -65,7 +70,8 @@ class FringeSetting(QMainWindow):
         if self.serial_port and self.serial_port.is_open:
             # 关闭串口
             self.timer.stop()
-            self.serial_port.close()
+            self.telemetry.stop()
+            self.driver.close()
             self.pushButton_Open.setText("Open")
             self.label_ComSta.setPixmap(QPixmap("res/invisible.png"))
             self.lineEdit.setEnabled(False)
@@ -83,6 +89,10 @@ class FringeSetting(QMainWindow):
                 self.checkBox.setEnabled(True)
                 self.checkBox_fan.setEnabled(True)
                 self.write_command("aa00060000068e")  # 查询激光状态
+                # 查询与应答解析在后台线程进行，定时器只刷新界面
+                self.driver = LaserThread(AsyncLaser(self.serial_port))
+                self.telemetry = LaserTelemetry(self.driver, interval=0.2)
+                self.telemetry.start()
                 self.timer.start(200)
 
     def write_command(self, command):
@@ -107,20 +117,18 @@ class FringeSetting(QMainWindow):
         return bytearray.fromhex(str_data)
 
     def timer_update(self):
-        """定时器回调，用于发送查询命令"""
-        commands = [
-            "aa00020000028e",  # 版本号
-            "aa00030000038e",  # 功率
-            "aa000e00000e8e",  # TEC 温度
-            "aa000f00000f8e",  # TEC 电流
-            "aa00100000108e",  # LD 电流
+        """定时器回调，用遥测缓存中的最新读数刷新界面，不访问串口"""
+        labels = [
+            ("version", self.label_7, "Version: {}"),
+            ("power", self.label_6, "Power: {} mW"),
+            ("tec_temperature", self.label_3, "TEC Temp: {:.2f} °C"),
+            ("tec_current", self.label_4, "TEC Current: {} mA"),
+            ("ld_current", self.label_5, "LD Current: {} mA"),
         ]
-        static_counter = getattr(self, "_counter", 0)
-        self.write_command(commands[static_counter])
-        static_counter = (static_counter + 1) % len(commands)
-        setattr(self, "_counter", static_counter)
-        # 激光器参数读取接口
-        self.read_data()
+        for name, label, text in labels:
+            reading = self.telemetry.latest(name)
+            if reading is not None:
+                label.setText(text.format(reading.value))
 
     def toggle_laser(self):
         """控制激光器开关"""
@@ -149,34 +157,6 @@ class FringeSetting(QMainWindow):
         command = f"aa000103{high_byte:02x}{low_byte:02x}8e"
         self.write_command(command)
 
-    def read_data(self):
-        """读取并解析串口数据"""
-        if self.serial_port and self.serial_port.is_open:
-            # 读取数据并解析
-            data = self.serial_port.read(16)
-            if data:
-                # 解析数据，根据命令的返回值显示不同的信息
-                if data[0] == 0x84:
-                    # 假设返回值是版本号
-                    version = f"{data[1]}.{data[2]}"
-                    self.label_7.setText(f"Version: {version}")
-                elif data[0] == 0x83:
-                    # 假设返回值是功率信息
-                    power = data[2] * 255 + data[3]
-                    self.label_6.setText(f"Power: {power} mW")
-                elif data[0] == 0x0E:
-                    # 假设返回值是TEC温度
-                    temperature = (data[2] * 255 + data[3]) / 100.0
-                    self.label_3.setText(f"TEC Temp: {temperature:.2f} °C")
-                elif data[0] == 0x0F:
-                    # 假设返回值是TEC电流
-                    current = (data[2] * 255 + data[3])
-                    self.label_4.setText(f"TEC Current: {current} mA")
-                elif data[0] == 0x10:
-                    # 假设返回值是LD电流
-                    ld_current = data[2] * 255 + data[3]
-                    self.label_5.setText(f"LD Current: {ld_current} mA")
-
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = FringeSetting()
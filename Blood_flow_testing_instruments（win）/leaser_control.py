@@ -4,6 +4,9 @@ import cv2
 import keyboard
 import numpy as np
 import serial
+from camera_source import open_camera
+from exposure_table import exposure_ms_for
+from laser_calibration import PowerCalibrator
 
 
 "本程序用于转译激光控制软件，重写串口通信函数，可直接调用程序中的函数进行激光器功率控制，详见各个函数注释"
@@ -13,11 +16,13 @@ class ComSetting:
         self.open_cmd = "aa00000100018e"
         self.close_cmd = "aa00000000008e"
         self.leaser_para_cmd = "aa00060000068e"
+        self.version = "aa00020000028e"  # 版本号
         self.power = "aa00030000038e"  # 功率
         self.TEC_temperature = "aa000e00000e8e"  # TEC 温度
         self.TEC_current = "aa000f00000f8e"  # TEC 电流
         self.LD_current = "aa00100000108e"  # LD 电流
         self._counter = 0  # 用于定时器回调的计数器
+        self.power_setpoint = None  # 最近一次下发的功率设定值
 
     def set_roi(self, frame, roi_size=50):
         height, width, _ = frame.shape
@@ -41,15 +46,19 @@ class ComSetting:
 
         return mean
 
-    def set_power_state(self, power):
+    def set_power_state(self, power, deadline=5.0, poll_interval=0.05):
         """
         power:设定的功率
-        :return:0
+        deadline:最长等待时间（秒），超时后放弃等待
+        poll_interval:两次读数之间的间隔（秒）
+        :return:截止时间内是否到达目标功率
         """
         # 设置功率
         self.set_power(power)
         time.sleep(0.1)
-        while True:
+        end = time.perf_counter() + deadline
+        while time.perf_counter() < end:
+            time.sleep(poll_interval)
             # 读取功率
             self.send_data(self.power)
 
@@ -61,92 +70,92 @@ class ComSetting:
                 # 如果误差小于5，认为设置成功
                 if power_error <= 5:
                     print(f"功率设置成功: 目标功率 {power}, 当前功率 {current_power}")
-                    break
+                    return True
                 else:
                     print(f"功率设置中: 目标功率 {power}, 当前功率 {current_power}, 误差 {power_error}")
             #else:
                 # 如果读取的功率数据无效，则继续等待
                 #print(f"当前功率读取无效，继续等待...")
 
-        print(f"调整功率至 {power}")
+        print(f"功率设置超时: 目标功率 {power}")
+        return False
 
 
-    def leaser_calibration(self, k_min, k_max, exposure_times, camera_index, fps=20, roi_size=50, initial_power=500):
+    def leaser_calibration(self, k_min, k_max, exposure_times, camera_index, fps=20, roi_size=50, initial_power=500,
+                           show=True, exposure_times_ms=None, frames=3):
         """
         激光曝光标定序列
         :param fps: 采样帧率
-        :param camera_index: 相机编号
+        :param camera_index: 相机编号（也可为录制目录或仿真相机，见 camera_source.open_camera）
+        :param show: 是否显示标定画面，False 时可无界面运行
         :param exposure_times: 相机曝光序列
+        :param exposure_times_ms: 各曝光的实际时长（ms），用于预测功率，默认查实测曝光表，没有时按名义值估计
+        :param frames: 每次测量平均的帧数
         :return: 激光输出功率序列[w1, w2, w3, ...wn]
         """
-        power = initial_power
-
         # 相机初始化
-        cap = cv2.VideoCapture(camera_index)
+        cap = open_camera(camera_index)
         if not cap.isOpened():
             print("Error: Unable to access the camera.")
             return []
         cap.set(cv2.CAP_PROP_FPS, fps)
 
+        calibrator = PowerCalibrator(k_min, k_max)
+        if exposure_times_ms is None:
+            exposure_times_ms = exposure_ms_for(exposure_times)
         laser_powers = []  # 记录激光器的功率序列
-
-        for idx, exposure in enumerate(exposure_times):
-            print(f"曝光{exposure}")
-            cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
-            time.sleep(0.5)  # 稳定相机参数
-
-            # 调整激光功率和曝光参数
-            while power > 0:
-                # 读取图像
+        state = {"quit": False, "power": initial_power}
+
+        def set_power(power):
+            state["power"] = power
+            self.set_power_state(power)
+
+        def measure():
+            # 丢弃功率变化前缓存的帧，再取几帧平均
+            for _ in range(2):
+                cap.read()
+            means = []
+            for _ in range(frames):
                 ret, frame = cap.read()
                 if not ret:
-                    print(f"Error: Unable to capture frame for exposure {exposure} ms.")
-                    break
-
-                # 标记 ROI 区域
+                    continue
                 frame_with_roi, (x1, y1, x2, y2) = self.set_roi(frame, roi_size=roi_size)
-                roi_frame = frame[y1:y2, x1:x2]
-
-                # 计算 ROI 区域内均值
-                mean = self.calculate_histogram_mean(roi_frame)
+                means.append(self.calculate_histogram_mean(frame[y1:y2, x1:x2]))
+            if not means:
+                print(f"Error: Unable to capture frame for exposure {exposure} ms.")
+                return 0.0
+            mean = float(np.mean(means))
 
+            if show:
                 # 实时显示信息到图像上
                 cv2.rectangle(frame_with_roi, (x1, y1), (x2, y2), (0, 255, 0), 2)
                 cv2.putText(frame_with_roi, f"Exposure: {exposure} ms", (20, 40),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame_with_roi, f"Power: {power}", (20, 70),
+                cv2.putText(frame_with_roi, f"Power: {state['power']}", (20, 70),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 cv2.putText(frame_with_roi, f"Mean: {mean:.2f}", (20, 100),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-                # 实时显示画面
                 cv2.imshow("Calibration Feed", frame_with_roi)
-                key = cv2.waitKey(1)
-                if key == ord('q'):  # 按 q 键退出
-                    cap.release()
-                    cv2.destroyAllWindows()
-                    return laser_powers
-
-                # 判断均值是否满足范围
-                if k_min <= mean <= k_max:
-                    laser_powers.append(power)
-                    print(f"曝光 {exposure} ms: 满足条件，记录功率 {power}")
-                    break
-                elif mean > k_max:
-                    power -= 10  # 调整功率
-                    # 确保功率不会低于下限
-                    if power < 10:
-                        power = 10
-                    self.set_power_state(power)
-                elif mean < k_min:
-                    power += 10  # 调整功率
-                    # 确保功率不会超过上限
-                    if power > 500:
-                        power = 500
-                    self.set_power_state(power)
-            if power <= 0:
-                print("Warning: 激光器功率降到最小，未满足均值条件！")
-                laser_powers.append(0)
+                if cv2.waitKey(1) == ord('q'):  # 按 q 键退出
+                    state["quit"] = True
+            return mean
+
+        for idx, exposure in enumerate(exposure_times):
+            print(f"曝光{exposure}")
+            cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
+            time.sleep(0.5)  # 稳定相机参数
+
+            step = calibrator.calibrate_exposure(exposure, exposure_times_ms[idx], set_power, measure, state["power"])
+            if state["quit"]:
+                cap.release()
+                cv2.destroyAllWindows()
+                return laser_powers
+            laser_powers.append(step.power)
+            if step.converged:
+                print(f"曝光 {exposure} ms: 满足条件，记录功率 {step.power}（写功率 {step.writes} 次）")
+            else:
+                print(f"Warning: 曝光 {exposure} ms 写功率 {step.writes} 次仍未满足均值条件，记录最接近的功率 {step.power}"
+                      f"（均值 {step.mean:.2f}）")
 
         # 清理资源
         """
@@ -222,6 +231,22 @@ class ComSetting:
             print(f"读取数据失败: {e}")
             return None
 
+    def query(self, command, retries=3):
+        """
+        发送查询命令并读取返回值，先清空接收缓冲区以免读到旧的应答
+        :param command: 查询命令，如 self.version、self.TEC_temperature
+        :param retries: 读取失败时的重试次数
+        :return: 解析后的值，失败返回 None
+        """
+        for _ in range(retries):
+            if self.serial_port and self.serial_port.is_open:
+                self.serial_port.reset_input_buffer()
+            self.send_data(command)
+            result = self.read_data()
+            if result is not None:
+                return result
+        return None
+
     def set_power(self, power):
         """
         设置激光器功率
@@ -252,6 +277,7 @@ class ComSetting:
         print("功率指令为：", send_data)
         # 发送数据
         self.send_data(send_data)
+        self.power_setpoint = power
 
     def init_serial(self, port_name, baudrate=9600, timeout=1):
         """
@@ -0,0 +1,120 @@
+import time
+
+import cv2
+import numpy as np
+
+from leaser_control import ComSetting
+from camera_source import open_camera
+from speckle_stats import to_gray
+
+"本程序为全帧空间散斑衬比成像（LSCI）模式，用盒式滤波计算 I 与 I² 的局部均值，每帧代价与窗口大小无关，鼠标左键点击可选取血管位置"
+
+
+def speckle_contrast_map(frame, window=7):
+    """
+    逐像素计算局部散斑衬比 K
+    :param frame: 输入图像（BGR 或灰度）
+    :param window: 滑动窗口边长（像素）
+    :return: 与输入同尺寸的 K 图（float32）
+    """
+    intensity = to_gray(frame).astype(np.float32)
+    ksize = (window, window)
+    # boxFilter/sqrBoxFilter 内部使用积分式的行列累加，代价与窗口大小无关
+    mean = cv2.boxFilter(intensity, -1, ksize, borderType=cv2.BORDER_REFLECT)
+    mean_sq = cv2.sqrBoxFilter(intensity, -1, ksize, borderType=cv2.BORDER_REFLECT)
+    variance = mean_sq - mean * mean
+    np.maximum(variance, 0, out=variance)
+    np.sqrt(variance, out=variance)
+    np.maximum(mean, 1e-6, out=mean)
+    return variance / mean
+
+
+def contrast_to_color(k_map, k_max=0.6):
+    """K 图转伪彩色，K 越小（血流越快）越偏红"""
+    scaled = np.clip(k_map * (255.0 / k_max), 0, 255).astype(np.uint8)
+    return cv2.applyColorMap(255 - scaled, cv2.COLORMAP_JET)
+
+
+def benchmark_contrast_map(size=496, windows=(5, 7, 15, 31), repeat=100):
+    """单核下测量 size×size 图像的 K 图计算耗时"""
+    cv2.setNumThreads(1)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(size, size), dtype=np.uint8)
+    for window in windows:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            speckle_contrast_map(frame, window)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"窗口 {window}x{window}: {elapsed * 1000:.2f} ms/帧 ({1 / elapsed:.0f} fps)")
+
+
+def s_LSCI(initial_power=50, camera_index=0, fps=60, size=496, window=7, k_max=0.6, roi_size=50):
+    """
+    :param window: 局部衬比窗口边长
+    :param k_max: 伪彩色显示的 K 上限
+    :param roi_size: 点击选取位置时统计的区域大小
+    """
+    cap = open_camera(camera_index)
+    if not cap.isOpened():
+        print("无法打开相机")
+        return
+
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, size)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    cap.set(cv2.CAP_PROP_EXPOSURE, -1)
+    controller = ComSetting()
+    port_name = "COM6"
+
+    if controller.init_serial(port_name):
+        # 打开激光器
+        controller.send_data(controller.open_cmd)
+        time.sleep(0.5)
+
+    controller.set_power_state(initial_power)
+
+    selected = {"point": None}
+
+    def on_mouse(event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            selected["point"] = (x, y)
+            print(f"选取位置: ({x}, {y})")
+
+    cv2.namedWindow('LSCI', cv2.WINDOW_NORMAL)
+    cv2.setMouseCallback('LSCI', on_mouse)
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print("无法接收帧")
+            break
+
+        start = time.perf_counter()
+        k_map = speckle_contrast_map(frame, window)
+        elapsed = time.perf_counter() - start
+
+        view = contrast_to_color(k_map, k_max)
+        cv2.putText(view, f"{elapsed * 1000:.1f} ms", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        if selected["point"] is not None:
+            x, y = selected["point"]
+            half = roi_size // 2
+            region = k_map[max(0, y - half):y + half, max(0, x - half):x + half]
+            k_mean = float(region.mean())
+            cv2.rectangle(view, (x - half, y - half), (x + half, y + half), (255, 255, 255), 1)
+            cv2.putText(view, f"K={k_mean:.3f} 1/K^2={1 / max(k_mean ** 2, 1e-12):.1f}", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        cv2.imshow('LSCI', view)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+    controller.send_data(controller.close_cmd)
+    controller.close_serial()
+
+
+if __name__ == "__main__":
+    benchmark_contrast_map()
+    s_LSCI(initial_power=150, camera_index=0, fps=60, size=496, window=7)
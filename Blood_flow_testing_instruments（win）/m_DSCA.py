@@ -3,12 +3,17 @@ import os
 import cv2
 import numpy as np
 import time
+from concurrent.futures import Future
 
 from matplotlib import pyplot as plt
 
-from LM_cac import cac_LM
+from LM_cac import cac_LM, fit_k2
 from leaser_control import ComSetting
+from calibration_cache import load_or_calibrate
 from s_DSCA import cac_k
+from speckle_stats import speckle_stats
+from camera_source import open_camera
+from recording import RecordingCapture
 
 "本程序为多曝光拟合程序，执行后多次曝光，拟合曲线显示，并在命令栏显示血流指数，由于树梅派算力有限，使用win平台运行"
 def set_roi(frame, roi_size=50):
@@ -20,12 +25,111 @@ def set_roi(frame, roi_size=50):
     return frame, (x1, y1, x2, y2)
 
 
+def _relative_drift(values):
+    """窗口前后两半均值的相对差"""
+    half = len(values) // 2
+    early = np.mean(values[:half])
+    late = np.mean(values[half:])
+    return abs(late - early) / max(abs(late), 1e-12)
+
+
+def read_roi_mean(cap, roi_size):
+    """
+    读一帧，返回ROI均值；用作改变曝光或激光功率之前的基线
+    :return: ROI均值，读帧失败时为 None
+    """
+    ret, frame = cap.read()
+    if not ret:
+        return None
+    _, (x1, y1, x2, y2) = set_roi(frame, roi_size=roi_size)
+    return speckle_stats(frame[y1:y2, x1:x2]).mean
+
+
+def drain_buffer(cap, default_frames=4):
+    """
+    丢弃改参数之前已进入 OpenCV/V4L2 队列的帧，这些帧仍是旧曝光
+    :param default_frames: 无法读取 CAP_PROP_BUFFERSIZE 时丢弃的帧数（V4L2 默认 4 个缓冲区）
+    :return: 丢弃的帧数
+    """
+    queued = int(cap.get(cv2.CAP_PROP_BUFFERSIZE) or 0)
+    if queued <= 0:
+        queued = default_frames
+    # 回放、仿真等包装对象没有 grab，用 read 代替
+    grab = getattr(cap, "grab", cap.read)
+    for _ in range(queued):
+        grab()
+    return queued
+
+
+def wait_until_settled(cap, roi_size, baseline_mean=None, window=6, mean_tolerance=0.02, k2_tolerance=0.05,
+                       min_fresh=None, max_wait=2.0, show=True):
+    """
+    曝光或激光功率改变后持续读帧，监视ROI均值与k方，二者漂移都小于容差时认为参数已生效
+    先丢弃队列中的旧帧；均值离开改参数前的基线，或已读到 min_fresh 帧新帧之后才开始判断收敛，
+    避免仍处于旧曝光、看起来同样稳定的帧被当作已收敛
+    :param baseline_mean: 改参数之前的ROI均值（read_roi_mean），为 None 时只按新帧数判断
+    :param window: 判断漂移所用的连续帧数
+    :param mean_tolerance: 均值相对漂移容差，也是判断离开基线的阈值
+    :param k2_tolerance: k方相对漂移容差
+    :param min_fresh: 均值未离开基线时（如激光功率补偿了曝光变化）开始判断前至少读取的新帧数，默认 2 * window
+    :param max_wait: 最长等待时间（秒），超时后直接开始采样
+    :param show: 是否显示画面
+    :return: (是否收敛, 实际等待时间秒)
+    """
+    if min_fresh is None:
+        min_fresh = 2 * window
+    start = time.perf_counter()
+    drain_buffer(cap)
+    means = []
+    k2s = []
+    left_baseline = baseline_mean is None
+    while time.perf_counter() - start < max_wait:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        _, (x1, y1, x2, y2) = set_roi(frame, roi_size=roi_size)
+        stats = speckle_stats(frame[y1:y2, x1:x2])
+        means.append(stats.mean)
+        k2s.append(stats.k2)
+        if show:
+            cv2.imshow('Camera Feed', frame)
+            cv2.waitKey(1)
+
+        if not left_baseline:
+            left_baseline = abs(stats.mean - baseline_mean) / max(abs(baseline_mean), 1e-12) >= mean_tolerance
+            if left_baseline:
+                # 从离开基线的帧开始计窗口，之前的帧可能仍是旧曝光
+                means = means[-1:]
+                k2s = k2s[-1:]
+        if not left_baseline and len(means) < min_fresh:
+            continue
+        if len(means) >= window:
+            if _relative_drift(means[-window:]) < mean_tolerance and _relative_drift(k2s[-window:]) < k2_tolerance:
+                return True, time.perf_counter() - start
+    return False, time.perf_counter() - start
+
+
+def wait_for_power(cap, pending, show=True):
+    """
+    异步驱动（laser_async.LaserThread）的功率调节进行中时继续读帧，保持相机缓冲区新鲜
+    :param pending: set_power_state 返回的 Future
+    :return: 是否在截止时间内到达目标功率
+    """
+    while not pending.done():
+        ret, frame = cap.read()
+        if ret and show:
+            cv2.imshow('Camera Feed', frame)
+            cv2.waitKey(1)
+    return pending.result()
+
+
 import cv2
 import numpy as np
 import time
 import os
 
-def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, output_dir, num, leaser_powers, controller):
+def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, output_dir, num, leaser_powers, controller, max_settle=2.0,
+                                 cap=None, show=True):
     """
     :param camera_index: 相机编号
     :param roi_size: 中心计算区域大小
@@ -34,36 +138,44 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
     :param output_dir: 采集图像输出路径
     :param num: 每个曝光时间的图像采样数
     :param leaser_powers: 激光功率序列
-    :param controller: 控制激光功率的对象
+    :param controller: 控制激光功率的对象（ComSetting，或功率调节不阻塞的 laser_async.LaserThread）
+    :param max_settle: 每步等待ROI统计量收敛的最长时间（秒）
+    :param cap: 已打开的相机，传入时复用且不释放（连续测量用）
+    :param show: 是否显示画面，False 时可无界面运行
     :return: 所有k方的数组，用于后续函数拟合
     """
 
     k_averages = []
     k_average_all = []
 
-    # 相机开机
-    cap = cv2.VideoCapture(camera_index)
-    if not cap.isOpened():
-        print("Error: Unable to access the camera.")
-        return
-    cap.set(cv2.CAP_PROP_FPS, fps)
-
-    # 禁用自动曝光（某些相机需要）
-    cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
+    own_cap = cap is None
+    if own_cap:
+        # 相机开机
+        cap = init_camera(camera_index, fps)
+        if cap is None:
+            return
 
-    # 创建窗口并设置为持续显示模式
-    cv2.namedWindow('Camera Feed', cv2.WINDOW_NORMAL)
+    if show:
+        # 创建窗口并设置为持续显示模式
+        cv2.namedWindow('Camera Feed', cv2.WINDOW_NORMAL)
 
     # 根据曝光序列采集图像
     for idx, exposure in enumerate(exposure_times):
         print(f"\n设置曝光时间为 {exposure} ms...")
+        step_start = time.perf_counter()
+        baseline_mean = read_roi_mean(cap, roi_size)
         cap.set(cv2.CAP_PROP_EXPOSURE, float(exposure))
-        time.sleep(1)  # 等待曝光设置生效
 
         power = leaser_powers[idx]
         print(f"设置激光功率为 {power}...")
-        controller.set_power_state(power)
-        time.sleep(1)  # 等待激光器稳定
+        pending = controller.set_power_state(power)
+        if isinstance(pending, Future):
+            wait_for_power(cap, pending, show)
+
+        # 用ROI均值与k方的收敛代替固定等待
+        settled, settle_time = wait_until_settled(cap, roi_size, baseline_mean, max_wait=max_settle, show=show)
+        state = "已收敛" if settled else "等待超时"
+        print(f"曝光 {exposure}: {state}，统计量稳定耗时 {settle_time:.2f} s，本步准备共 {time.perf_counter() - step_start:.2f} s")
 
         k_values = []
 
@@ -76,14 +188,14 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
             frame_with_roi, (x1, y1, x2, y2) = set_roi(frame, roi_size=roi_size)
             roi_frame = frame_with_roi[y1:y2, x1:x2]
 
-            cv2.imshow('Camera Feed', frame)
-
             k_value = cac_k(roi_frame, 2)  # 计算k^2
             k_values.append(k_value)
 
-            if cv2.waitKey(10) & 0xFF == ord('q'):
-                print("Exiting...")
-                break
+            if show:
+                cv2.imshow('Camera Feed', frame)
+                if cv2.waitKey(10) & 0xFF == ord('q'):
+                    print("Exiting...")
+                    break
 
         if k_values:
             k_average = np.mean(k_values)
@@ -101,13 +213,71 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
     print("\n=== k 值数组 ===")
     print(["{:.4f}".format(float(x)) for x in k_average_all])
 
-    cap.release()
-    cv2.destroyAllWindows()
+    if own_cap:
+        cap.release()
+        cv2.destroyAllWindows()
     print("Capture complete. Images saved in:", output_dir)
 
     return k_average_all
 
 
+def init_camera(camera_index, fps):
+    cap = open_camera(camera_index)
+    if not cap.isOpened():
+        print("Error: Unable to access the camera.")
+        return None
+    cap.set(cv2.CAP_PROP_FPS, fps)
+
+    # 禁用自动曝光（某些相机需要）
+    cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
+    return cap
+
+
+def continuous_mDSCA(camera_index, roi_size, fps, exposure_times, exposure_times_ms, num, leaser_powers, controller,
+                     initial_params, sweeps=None, max_settle=2.0, show=False, record_path=None):
+    """
+    连续多曝光测量：相机只打开一次，重复曝光扫描，每次拟合以上一次结果为初值（热启动）
+    :param exposure_times: 发给相机的曝光序列
+    :param exposure_times_ms: 对应的实际曝光时间（ms），用于拟合
+    :param initial_params: 第一次拟合的 (p, tao, v_noise) 初值
+    :param sweeps: 扫描次数，None 为一直运行直到 Ctrl+C
+    :param record_path: 不为 None 时录制每帧及其曝光、激光功率，便于离线回放
+    :return: 每次扫描的 FitResult 列表
+    """
+    cap = init_camera(camera_index, fps)
+    if cap is None:
+        return []
+    if record_path is not None:
+        cap = RecordingCapture(cap, record_path, power_source=lambda: controller.power_setpoint, roi_size=roi_size)
+
+    results = []
+    params = initial_params
+    sweep = 0
+    try:
+        while sweeps is None or sweep < sweeps:
+            k_average_all = capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, "", num,
+                                                         leaser_powers, controller, max_settle, cap=cap, show=show)
+            sweep += 1
+            if len(k_average_all) != len(exposure_times_ms):
+                print(f"第 {sweep} 次扫描数据不完整，跳过拟合")
+                continue
+
+            # 有实测曝光表时按档位查表，与单次测量的 cac_LM 一致
+            result = fit_k2(exposure_times_ms, k_average_all, params, exposure_indices=exposure_times)
+            if result is None:
+                continue
+            params = result.params
+            results.append(result)
+            print(f"第 {sweep} 次扫描: p={params[0]:.4f}, tao_c={params[1]:.4f}, v_noise={params[2]:.5f}, "
+                  f"ICT={result.ict:.5f}, 拟合 {result.nfev} 次求值 {result.wall_time * 1000:.1f} ms")
+    except KeyboardInterrupt:
+        print("连续测量已停止")
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+    return results
+
+
 if __name__ == "__main__":
     # 曝光2，只有20帧率，最小调节步长为1
     # exposure_times = [0.05, 0.1, 0.15, 0.20, 0.3, 0.5, 1, 2, 4, 6, 8, 12, 20, 30]
@@ -139,7 +309,12 @@ if __name__ == "__main__":
 
     # 测光
     #leaser_powers = controller.leaser_calibration(k_min, k_max,exposure_times, camera_index, fps=20, roi_size=50, initial_power=200)
-    leaser_powers = [200, 160, 90, 83, 80 ]
+    # 有效的标定缓存直接使用，否则重新标定；串口未打开时使用某一次标定得到的功率
+    if controller.serial_port and controller.serial_port.is_open:
+        leaser_powers = load_or_calibrate(controller, camera_index, exposure_times, roi_size, k_min, k_max, fps=20,
+                                          initial_power=200)
+    else:
+        leaser_powers = [200, 160, 90, 83, 80 ]
     # 某一次标定得到的激光功率
     #leaser_powers = [310, 310, 200, 100, 100, 100]
     print(f"激光器功率序列为：{leaser_powers}")
@@ -149,5 +324,6 @@ if __name__ == "__main__":
     #exposure_times_fake = [16, 19, 24, 50, 100]
     exposure_times_fake = [6.25, 12.5, 25,50, 100]
     #exposure_times_fake = [6.25, 12.5, 25, 50, 100, 400]
-    cac_LM(exposure_times_fake, k_average_all, initial_params)
+    # 有实测曝光表（exposure_characterize）时按档位查表，否则使用手填的曝光时间
+    cac_LM(exposure_times_fake, k_average_all, initial_params, exposure_indices=exposure_times)
     print(f"激光器功率序列为：{leaser_powers}")
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+"本程序定义原始散斑采集的录制格式与回放相机：按块存储为内存映射的 .npy 文件，每帧附带时间戳、曝光设置与激光功率，回放对象提供与 cv2.VideoCapture 相同的 read() 接口"
+
+SESSION_FILE = "session.json"
+FRAME_META_DTYPE = np.dtype([("timestamp", "f8"), ("exposure", "f8"), ("power", "f8")])
+
+
+def _chunk_paths(path, index):
+    return (os.path.join(path, f"chunk_{index:05d}.npy"),
+            os.path.join(path, f"chunk_{index:05d}_meta.npy"))
+
+
+class SessionRecorder:
+    def __init__(self, path, chunk_frames=256, roi_size=None):
+        """
+        :param path: 录制目录
+        :param chunk_frames: 每个块文件的帧数
+        :param roi_size: 不为 None 时只保存中心 roi_size 区域
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.roi_size = roi_size
+        self.frame_shape = None
+        self.frames = 0
+        self._chunk = None
+        self._meta = None
+        os.makedirs(path, exist_ok=True)
+        # 打开时即写入 session.json，每次块刷新时更新，未正常关闭的录制也能回放已刷新的帧
+        self._write_session()
+
+    def _crop(self, frame):
+        if self.roi_size is None:
+            return frame
+        height, width = frame.shape[:2]
+        x1 = (width - self.roi_size) // 2
+        y1 = (height - self.roi_size) // 2
+        return frame[y1:y1 + self.roi_size, x1:x1 + self.roi_size]
+
+    def _open_chunk(self, index):
+        frame_path, meta_path = _chunk_paths(self.path, index)
+        self._chunk = np.lib.format.open_memmap(frame_path, mode="w+", dtype=np.uint8,
+                                                shape=(self.chunk_frames,) + self.frame_shape)
+        self._meta = np.lib.format.open_memmap(meta_path, mode="w+", dtype=FRAME_META_DTYPE,
+                                               shape=(self.chunk_frames,))
+
+    def write(self, frame, timestamp, exposure, power):
+        frame = self._crop(frame)
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+            self._write_session()
+        slot = self.frames % self.chunk_frames
+        if slot == 0:
+            self._flush()
+            self._open_chunk(self.frames // self.chunk_frames)
+        self._chunk[slot] = frame
+        self._meta[slot] = (timestamp, exposure, power)
+        self.frames += 1
+
+    def _flush(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._meta.flush()
+            self._write_session()
+
+    def _write_session(self):
+        info = {
+            "version": 1,
+            "frame_shape": None if self.frame_shape is None else list(self.frame_shape),
+            "chunk_frames": self.chunk_frames,
+            "frames": self.frames,
+        }
+        with open(os.path.join(self.path, SESSION_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+
+    def close(self):
+        self._flush()
+        self._chunk = None
+        self._meta = None
+
+
+class RecordingCapture:
+    def __init__(self, cap, path, power_source=None, roi_size=None, chunk_frames=256):
+        """
+        包装已打开的相机，read() 的同时录制
+        :param cap: 相机对象
+        :param path: 录制目录
+        :param power_source: 无参函数，返回当前激光功率（如 lambda: controller.power_setpoint）
+        :param roi_size: 只保存中心区域
+        """
+        self.cap = cap
+        self.recorder = SessionRecorder(path, chunk_frames, roi_size)
+        self.power_source = power_source
+        self.exposure = cap.get(cv2.CAP_PROP_EXPOSURE)
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            power = self.power_source() if self.power_source else float("nan")
+            self.recorder.write(frame, time.perf_counter(), self.exposure, power)
+        return ret, frame
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_EXPOSURE:
+            self.exposure = value
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.recorder.close()
+        self.cap.release()
+
+
+class ReplayCapture:
+    def __init__(self, path, realtime=True, loop=False):
+        """
+        :param path: 录制目录
+        :param realtime: True 按录制时间戳节奏回放，False 以最快速度回放
+        :param loop: 播放完毕后是否从头循环
+        """
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        with open(os.path.join(path, SESSION_FILE), encoding="utf-8") as f:
+            info = json.load(f)
+        self.frame_count = info["frames"]
+        self.chunk_frames = info["chunk_frames"]
+        self._chunks = []
+        self._metas = []
+        for index in range((self.frame_count + self.chunk_frames - 1) // self.chunk_frames):
+            frame_path, meta_path = _chunk_paths(path, index)
+            self._chunks.append(np.load(frame_path, mmap_mode="r"))
+            self._metas.append(np.load(meta_path, mmap_mode="r"))
+        self.position = 0
+        self.last_meta = None
+        self.convert_rgb = True  # False 时灰度录制直接返回灰度帧，对应 CAP_PROP_CONVERT_RGB=0
+        self._opened = self.frame_count > 0
+        self._start_wall = None
+        self._start_ts = None
+
+    def _meta_at(self, index):
+        return self._metas[index // self.chunk_frames][index % self.chunk_frames]
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.position >= self.frame_count:
+            if not self.loop:
+                return False, None
+            self.position = 0
+            self._start_wall = None
+
+        chunk, slot = divmod(self.position, self.chunk_frames)
+        meta = self._metas[chunk][slot]
+        if self.realtime:
+            if self._start_wall is None:
+                self._start_wall = time.perf_counter()
+                self._start_ts = meta["timestamp"]
+            delay = (meta["timestamp"] - self._start_ts) - (time.perf_counter() - self._start_wall)
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = np.array(self._chunks[chunk][slot])
+        if frame.ndim == 2 and self.convert_rgb:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        self.last_meta = meta
+        self.position += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_EXPOSURE and self.last_meta is not None:
+            return float(self.last_meta["exposure"])
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_FPS and self.frame_count > 1:
+            first = self._meta_at(0)["timestamp"]
+            last = self._meta_at(self.frame_count - 1)["timestamp"]
+            return (self.frame_count - 1) / (last - first) if last > first else 0.0
+        return 0.0
+
+    def set(self, prop, value):
+        """回放时相机参数不可修改，只支持跳转帧位置与是否转换为 BGR"""
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(min(max(value, 0), self.frame_count))
+            self._start_wall = None
+            return True
+        if prop == cv2.CAP_PROP_CONVERT_RGB:
+            self.convert_rgb = bool(value)
+            return True
+        return False
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+        self._chunks = []
+        self._metas = []
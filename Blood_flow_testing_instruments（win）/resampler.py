@@ -0,0 +1,120 @@
+import numpy as np
+
+from stream_filter import RateMeter
+
+"本程序为按时间戳的流式重采样：每个样本携带采集时间戳，线性插值到固定间隔的均匀网格后再做带通滤波与心率估计，同时持续估计真实帧率；树莓派供电不足导致帧率下降时，滤波截止频率与心率不再随之偏移"
+
+
+class StreamResampler:
+    def __init__(self, fs=None, max_gap=0.5, rate_alpha=0.05, fs_tolerance=0.05):
+        """
+        :param fs: 输出网格的采样率（Hz），为 None 时在实测帧率稳定后锁定为该帧率
+        :param max_gap: 相邻样本间隔超过该值（秒）时不跨越插值，从新样本重新开始网格
+        :param rate_alpha: 真实帧率估计的平滑系数
+        :param fs_tolerance: fs 为 None 时，实测帧率相对锁定值变化超过该比例则重新锁定（同 StreamingFilter.set_fs）
+        """
+        self.fs = fs
+        self.fs_tolerance = fs_tolerance
+        self._auto_fs = fs is None
+        self.max_gap = max_gap
+        self.rate_meter = RateMeter(alpha=rate_alpha)
+        self.gaps = 0
+        self._next_t = None
+        self._last_t = None
+        self._last_x = None
+        self._pending = []  # 锁定 fs 前暂存的样本
+
+    @property
+    def rate(self):
+        """实测帧率（Hz），数据不足时为 None"""
+        return self.rate_meter.rate
+
+    def process(self, timestamp, value):
+        """
+        加入一个样本（标量或一维数组），非有限值沿用上一个样本，还没有可沿用的样本时丢弃
+        :param timestamp: 采集时间戳（秒）
+        :return: 本样本之前（含）落在均匀网格上的 [(t, value), ...]
+        """
+        rate = self.rate_meter.update(timestamp)
+        value = np.asarray(value, dtype=float)
+        previous = self._pending[-1][1] if self._pending else self._last_x
+        if previous is not None:
+            value = np.where(np.isfinite(value), value, previous)
+        if not np.all(np.isfinite(value)):
+            return []
+        if self.fs is not None and self._auto_fs and rate is not None \
+                and abs(rate - self.fs) / self.fs > self.fs_tolerance:
+            # 实测帧率持续偏离锁定值（如供电不足降帧），网格改按新帧率
+            self.fs = round(rate)
+        if self.fs is None:
+            self._pending.append((timestamp, value))
+            if rate is None:
+                return []
+            self.fs = round(rate)
+            pending, self._pending = self._pending, []
+            output = []
+            for t, x in pending:
+                output.extend(self._advance(t, x))
+            return output
+        return self._advance(timestamp, value)
+
+    def _advance(self, timestamp, value):
+        if self._last_t is None or timestamp - self._last_t > self.max_gap:
+            if self._last_t is not None:
+                self.gaps += 1
+            self._last_t = timestamp
+            self._last_x = value
+            self._next_t = timestamp + 1.0 / self.fs
+            return [(timestamp, self._output(value))]
+        if timestamp <= self._last_t:
+            return []
+
+        output = []
+        span = timestamp - self._last_t
+        step = 1.0 / self.fs
+        while self._next_t <= timestamp:
+            weight = (self._next_t - self._last_t) / span
+            output.append((self._next_t, self._output(self._last_x + (value - self._last_x) * weight)))
+            self._next_t += step
+        self._last_t = timestamp
+        self._last_x = value
+        return output
+
+    @staticmethod
+    def _output(value):
+        return float(value) if value.ndim == 0 else value
+
+
+if __name__ == "__main__":
+    # 帧率在中途从 30 降到 20 fps：原方法按固定 fs 处理原始样本，重采样后按均匀网格处理
+    from heart_rate import fft_peak_bpm
+    from speckle_sim import pulse_shape
+    from stream_filter import StreamingFilter
+
+    rng = np.random.default_rng(0)
+    bpm = 75
+    intervals = np.concatenate([np.full(600, 1 / 30), np.full(400, 1 / 20)])
+    intervals *= 1 + 0.1 * rng.uniform(-1, 1, len(intervals))
+    timestamps = np.cumsum(intervals)
+    values = pulse_shape((timestamps * bpm / 60) % 1.0) + 0.1 * rng.standard_normal(len(timestamps))
+
+    fixed_filter = StreamingFilter(0.5, 4, 30)
+    raw_filtered = np.array([fixed_filter.process(v) for v in values])
+
+    resampler = StreamResampler(fs=30)
+    uniform_filter = StreamingFilter(0.5, 4, resampler.fs)
+    uniform_t = []
+    uniform_filtered = []
+    for t, v in zip(timestamps, values):
+        for grid_t, grid_v in resampler.process(t, v):
+            uniform_t.append(grid_t)
+            uniform_filtered.append(uniform_filter.process(grid_v))
+    uniform_t = np.array(uniform_t)
+    uniform_filtered = np.array(uniform_filtered)
+
+    sag = timestamps[600]
+    window = 300
+    print(f"降帧后实测帧率 {resampler.rate:.1f} fps，重采样输出 {resampler.fs} Hz")
+    print(f"原方法（按 30 Hz 处理原始样本）: {fft_peak_bpm(raw_filtered[-window:], 30):.1f} 次/分")
+    tail = uniform_t > sag + 2
+    print(f"重采样后: {fft_peak_bpm(uniform_filtered[tail][-window:], resampler.fs):.1f} 次/分（真实 {bpm}）")
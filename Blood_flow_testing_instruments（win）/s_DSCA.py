@@ -3,42 +3,23 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy.signal import butter, sosfilt
 from collections import deque
 
 from leaser_control import ComSetting
+from stream_filter import StreamingFilter
+from resampler import StreamResampler
+from capture_worker import CaptureWorker
+from speckle_stats import speckle_stats, to_gray
+from tau_lut import TauLookup
+from camera_source import open_camera
+from recording import RecordingCapture
+from auto_roi import AutoRoiSelector
+from gray_capture import GrayCapture
+from autoscale import AxisAutoscaler
 
-prev_y_min, prev_y_max = None, None
-adjust_threshold = 0.05
-smoothing_factor = 0.95
 "该程序为单次曝光测量，封装函数s_DSCA"
-def update_y_axis(ax, filtered_y_data):
-    global prev_y_min, prev_y_max
-
-    if len(filtered_y_data) < 80:
-        return
-
-    recent_data = list(filtered_y_data)[-80:]
-    y_min, y_max = min(recent_data), max(recent_data)
-    margin = (y_max - y_min) * 1.3
-    y_center = (y_max + y_min) / 2
-
-    if prev_y_min is not None and prev_y_max is not None:
-        min_change = abs(y_min - prev_y_min) / max(abs(prev_y_min), 1e-5)
-        max_change = abs(y_max - prev_y_max) / max(abs(prev_y_max), 1e-5)
-
-        if min_change < adjust_threshold and max_change < adjust_threshold:
-            return
-
-    if prev_y_min is not None and prev_y_max is not None:
-        y_min = smoothing_factor * y_min + (1 - smoothing_factor) * prev_y_min
-        y_max = smoothing_factor * y_max + (1 - smoothing_factor) * prev_y_max
-
-    ax.set_ylim(y_min - margin, y_max + margin)
-    prev_y_min, prev_y_max = y_min, y_max
-
 def draw_roi(frame, roi_size=50):
-    height, width, _ = frame.shape
+    height, width = frame.shape[:2]
     x1 = (width - roi_size) // 2
     y1 = (height - roi_size) // 2
     x2 = x1 + roi_size
@@ -47,7 +28,7 @@ def draw_roi(frame, roi_size=50):
     return frame, (x1, y1, x2, y2)
 
 def cac_k(roi_frame, sign):
-    gray_roi = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
+    gray_roi = to_gray(roi_frame)
     mean_i = np.mean(gray_roi)
     std_i = np.std(gray_roi)
     K = std_i / mean_i if mean_i != 0 else 0
@@ -60,19 +41,19 @@ def cac_k(roi_frame, sign):
     elif sign == 3:
         return -mean_i
 
-def butter_bandpass_sos(lowcut, highcut, fs, order=2):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    sos = butter(order, [low, high], btype='band', output='sos')
-    return sos
-
-def bandpass_filter(data, lowcut, highcut, fs, order=2):
-    sos = butter_bandpass_sos(lowcut, highcut, fs, order)
-    return sosfilt(sos, data)
-
-def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
-    cap = cv2.VideoCapture(camera_index)
+def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_size=50, plot_interval=50,
+           exposure_ms=50, lut_params=(0.5, 0.0), record_path=None, auto_roi=False,
+           gray_decode=False, pixelformat="MJPG"):
+    """
+    :param data_type: 0~3 同 cac_k 的 sign，4 为查表标定的逆相关时间 ICT=1/tau_c
+    :param exposure_ms: 当前曝光时间（ms），data_type=4 时用于选择查找表
+    :param lut_params: data_type=4 时查找表使用的 (p, v_noise)，取自多曝光拟合结果
+    :param record_path: 不为 None 时把ROI原始帧录制到该目录，可用 camera_index=目录 回放
+    :param auto_roi: True 时按脉搏信噪比自动选择ROI（见 auto_roi.py），roi_size 只用于选定前的中心ROI
+    :param gray_decode: True 时跳过 RGB 转换直接采集灰度帧（见 gray_capture.py），降低每帧解码的 CPU 开销
+    :param pixelformat: gray_decode 时请求的相机输出格式，默认与相机原有配置一致的 "MJPG"
+    """
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("无法打开相机")
         return
@@ -82,6 +63,9 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size)
     cap.set(cv2.CAP_PROP_FPS, fps)
     cap.set(cv2.CAP_PROP_EXPOSURE, -1)
+    gray_cap = None
+    if gray_decode:
+        cap = gray_cap = GrayCapture(cap, pixelformat)
     controller = ComSetting()
     port_name = "COM6"
 
@@ -91,51 +75,87 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
         time.sleep(0.5)
 
     controller.set_power_state(initial_power)
+    if record_path is not None:
+        # 自动选ROI时ROI位置会变化，录制整帧
+        cap = RecordingCapture(cap, record_path, power_source=lambda: controller.power_setpoint,
+                               roi_size=None if auto_roi else roi_size)
     # 图形数据初始化
     x_data = deque(maxlen=500)
-    y_data = deque(maxlen=500)
+    filtered_y_data = deque(maxlen=500)
+    # 样本按采集时间戳重采样到均匀网格（网格采样率锁定为实测帧率），带通滤波器按网格采样率设计
+    resampler = StreamResampler()
+    pulse_filter = StreamingFilter(0.5, 3, fps, 2)
 
     fig, ax = plt.subplots()
     line, = ax.plot([], [], 'r-')
     ax.set_xlabel("fps(60/s)")
     ax.set_ylabel("-1/k^2")
+    y_scaler = AxisAutoscaler(ax)
+
+    if data_type == 4:
+        # 查找表启动时从磁盘读取，每个样本只做一次插值
+        lut = TauLookup.load_or_build(exposure_ms, *lut_params)
+        stats_func = lambda roi_frame: (lut.ict(speckle_stats(roi_frame).k2),)
+        ax.set_ylabel("ICT (1/ms)")
+    else:
+        stats_func = lambda roi_frame: (cac_k(roi_frame, data_type),)
+
+    # 采集线程以相机全帧率计算处理值，绘图只读取新样本
+    worker = CaptureWorker(cap, roi_size, stats_func,
+                           roi_selector=AutoRoiSelector(data_type=data_type if data_type < 4 else 0) if auto_roi else None)
+    worker.start()
+    last_seq = 0
 
     def update_plot(frame_num):
-        ret, frame = cap.read()
-        if not ret:
-            return line,
-
+        nonlocal last_seq
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
             plt.close(fig)
+            worker.stop()
             cap.release()
             cv2.destroyAllWindows()
+            print(f"丢帧数: {worker.dropped_frames}")
+            if gray_cap is not None and gray_cap.decode_cpu_ms is not None:
+                print(f"灰度解码 CPU 时间: {gray_cap.decode_cpu_ms:.2f} ms/帧")
             return line,
 
-        frame_with_roi, (x1, y1, x2, y2) = draw_roi(frame, roi_size=roi_size)
-        roi_frame = frame[y1:y2, x1:x2]
-        processing_value = cac_k(roi_frame, data_type)
-        print(processing_value)
+        timestamps, values, last_seq, _ = worker.buffer.read_since(last_seq)
+        if len(timestamps) == 0:
+            return line,
 
-        x_data.append(len(x_data))
-        y_data.append(processing_value)
+        for timestamp, processing_value in zip(timestamps, values[:, 0]):
+            print(processing_value)
+            for _, grid_value in resampler.process(timestamp, processing_value):
+                x_data.append(len(x_data))
 
-        if len(y_data) > 60:
-            filtered_y_data = bandpass_filter(list(y_data), 0.5, 3, fps, 2)
-            filtered_y_data = deque(filtered_y_data, maxlen=500)
-        else:
-            filtered_y_data = y_data
+                pulse_filter.set_fs(resampler.fs)
+                filtered_value = pulse_filter.process(grid_value)
+                filtered_y_data.append(filtered_value)
+                y_scaler.push(filtered_value)
 
-        update_y_axis(ax, y_data)
-        line.set_data(range(len(x_data)), y_data)
+        y_scaler.update()
+        line.set_data(range(len(x_data)), filtered_y_data)
         ax.set_xlim(100, max(500, len(x_data)))
 
-        cv2.imshow('Camera Feed', frame_with_roi)  # 可选显示摄像头画面
+        frame = worker.latest_frame
+        if frame is not None:
+            if auto_roi and worker.roi is not None:
+                frame_with_roi = frame.copy()
+                x1, y1, x2, y2 = worker.roi
+                cv2.rectangle(frame_with_roi, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            else:
+                frame_with_roi, _ = draw_roi(frame, roi_size=roi_size)
+            cv2.imshow('Camera Feed', frame_with_roi)  # 可选显示摄像头画面
 
         return line,
 
-    ani = FuncAnimation(fig, update_plot, blit=False, interval=1000/fps, save_count=500)
-    plt.show()
+    ani = FuncAnimation(fig, update_plot, blit=False, interval=plot_interval, save_count=500)
+    try:
+        plt.show()
+    finally:
+        # 直接关闭绘图窗口时也要释放相机，录制的 session.json 在此时写入最终帧数
+        worker.stop()
+        cap.release()
 
 if __name__ == "__main__":
     s_DSCA(data_type=0, initial_power=150, camera_index=0, fps=60, size=496, roi_size=100)
@@ -0,0 +1,180 @@
+import time
+
+import cv2
+import numpy as np
+
+from LM_cac import model_func_k
+from exposure_table import DEFAULT_EXPOSURE_TABLE, nominal_exposure_ms
+
+"本程序为动态散斑相机仿真器：按给定 tau_c、beta、p、平均光强生成积分散斑帧，叠加散粒噪声与 8 位量化，并按心率调制 tau_c，接口与 cv2.VideoCapture 相同，用于无硬件压测与拟合验证"
+
+def pulse_shape(phase):
+    """单个心动周期内的脉搏波形（收缩峰 + 重搏波），phase 取 [0, 1)"""
+    systolic = np.exp(-((phase - 0.15) / 0.07) ** 2)
+    dicrotic = 0.35 * np.exp(-((phase - 0.45) / 0.1) ** 2)
+    return systolic + dicrotic
+
+
+class SpeckleSimulator:
+    def __init__(self, tau_c=5.0, beta=0.25, p=0.8, mean_intensity=100.0, gain=1.0, heart_rate=72.0,
+                 pulse_depth=0.3, fps=60.0, size=496, exposure=-1, exposure_table=None, realtime=False,
+                 ref_exposure_ms=None, ref_power=None, power_source=None, seed=None):
+        """
+        :param tau_c: 基线相关时间（ms）
+        :param beta: 相干因子
+        :param p: 动态散射比例
+        :param mean_intensity: 平均灰度（DN）
+        :param gain: 每 DN 对应的光子数，散粒噪声方差为 mean/gain（DN²）
+        :param heart_rate: 心率（次/分），0 表示不调制
+        :param pulse_depth: 收缩期 tau_c 的相对缩短幅度
+        :param fps: 帧率
+        :param size: 画面边长
+        :param exposure: 初始曝光（OpenCV 档位或 ms）
+        :param exposure_table: 曝光档位到 ms 的映射，默认 DEFAULT_EXPOSURE_TABLE
+        :param realtime: True 时按帧率节奏输出，False 时尽可能快
+        :param ref_exposure_ms: 不为 None 时平均光强与曝光时间成正比，mean_intensity 对应该曝光
+        :param ref_power: 不为 None 时平均光强与激光功率成正比，mean_intensity 对应该功率
+        :param power_source: 无参函数，返回当前激光功率（可接激光器仿真）
+        :param seed: 随机种子
+        """
+        self.tau_c = tau_c
+        self.beta = beta
+        self.p = p
+        self.mean_intensity = mean_intensity
+        self.gain = gain
+        self.heart_rate = heart_rate
+        self.pulse_depth = pulse_depth
+        self.fps = fps
+        self.size = int(size)
+        self.exposure_table = DEFAULT_EXPOSURE_TABLE if exposure_table is None else exposure_table
+        self.realtime = realtime
+        self.ref_exposure_ms = ref_exposure_ms
+        self.ref_power = ref_power
+        self.power_source = power_source
+        self.rng = np.random.default_rng(None if seed is None else int(seed))
+        self.exposure = exposure
+        self.sim_time = 0.0  # 仿真时钟（秒）
+        self.frame_count = 0
+        self.convert_rgb = True  # False 时 read() 直接返回灰度帧，对应 CAP_PROP_CONVERT_RGB=0
+        self._opened = True
+        self._next_wall = None
+
+    @property
+    def exposure_ms(self):
+        return nominal_exposure_ms(self.exposure, self.exposure_table)
+
+    @property
+    def frame_period(self):
+        """帧间隔（秒），曝光时间长于 1/fps 时帧率受曝光限制"""
+        return max(1.0 / self.fps, self.exposure_ms / 1000.0)
+
+    def tau_at(self, t):
+        """t 时刻（秒）的 tau_c，收缩期血流加快、tau_c 变短"""
+        if self.heart_rate <= 0:
+            return self.tau_c
+        phase = (t * self.heart_rate / 60.0) % 1.0
+        return self.tau_c / (1.0 + self.pulse_depth * pulse_shape(phase))
+
+    def current_mean(self):
+        mean = self.mean_intensity
+        if self.ref_exposure_ms is not None:
+            mean *= self.exposure_ms / self.ref_exposure_ms
+        if self.ref_power is not None and self.power_source is not None:
+            mean *= self.power_source() / self.ref_power
+        return mean
+
+    def expected_k2(self, t=None):
+        """不含噪声的理论 k方"""
+        tau = self.tau_at(self.sim_time if t is None else t)
+        return float(model_func_k(self.exposure_ms, self.p, tau, 0.0, self.beta))
+
+    def generate(self):
+        """生成一帧灰度图（uint8），不推进仿真时钟"""
+        k2 = max(self.expected_k2(), 1e-6)
+        mean = self.current_mean()
+        # 积分散斑光强近似服从形状参数 M=1/K² 的 Gamma 分布
+        shape = 1.0 / k2
+        size = (self.size, self.size)
+        intensity = self.rng.standard_gamma(shape, size, dtype=np.float32)
+        intensity *= mean / shape
+        if self.gain > 0:
+            # 光子数在百量级，泊松散粒噪声用同方差的高斯近似，比逐像素泊松抽样快约 4 倍
+            intensity += np.sqrt(intensity / self.gain) * self.rng.standard_normal(size, dtype=np.float32)
+        return np.clip(np.rint(intensity), 0, 255).astype(np.uint8)
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next_wall is None:
+                self._next_wall = now
+            delay = self._next_wall - now
+            if delay > 0:
+                time.sleep(delay)
+            self._next_wall += self.frame_period
+
+        gray = self.generate()
+        self.sim_time += self.frame_period
+        self.frame_count += 1
+        if not self.convert_rgb:
+            return True, gray
+        return True, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_EXPOSURE:
+            self.exposure = value
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = float(value)
+        elif prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            self.size = int(value)
+        elif prop == cv2.CAP_PROP_CONVERT_RGB:
+            self.convert_rgb = bool(value)
+        else:
+            return False
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_EXPOSURE:
+            return float(self.exposure)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            return float(self.size)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_CONVERT_RGB:
+            return float(self.convert_rgb)
+        return 0.0
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+if __name__ == "__main__":
+    from LM_cac import fit_k2
+    from speckle_stats import speckle_stats
+
+    # 1. 生成速度
+    sim = SpeckleSimulator(size=496, seed=0)
+    start = time.perf_counter()
+    for _ in range(100):
+        sim.read()
+    elapsed = (time.perf_counter() - start) / 100
+    print(f"496x496 生成: {elapsed * 1000:.2f} ms/帧，{1 / elapsed:.0f} fps")
+
+    # 2. 多曝光拟合能否恢复真值（平均光强不随曝光变化，散粒与量化噪声使 k方 整体抬高约 1/I + 1/(12I²)）
+    sim = SpeckleSimulator(tau_c=8.0, p=0.7, heart_rate=0, size=200, seed=1)
+    exposure_times = list(DEFAULT_EXPOSURE_TABLE)
+    k2_values = []
+    for exposure in exposure_times:
+        sim.set(cv2.CAP_PROP_EXPOSURE, exposure)
+        k2_values.append(np.mean([speckle_stats(sim.read()[1]).k2 for _ in range(10)]))
+    result = fit_k2([DEFAULT_EXPOSURE_TABLE[e] for e in exposure_times], k2_values, [0.5, 10, 0.01])
+    # 5 个曝光点下 p 与 v_noise 强相关，主要看 tao_c 是否恢复
+    mean = sim.current_mean()
+    print(f"真值: p=0.7, tao_c=8.0, v_noise≈{1 / mean + 1 / (12 * mean ** 2):.5f}")
+    print(f"拟合: p={result.params[0]:.3f}, tao_c={result.params[1]:.3f}, v_noise={result.params[2]:.5f}")
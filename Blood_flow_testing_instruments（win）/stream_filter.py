@@ -0,0 +1,160 @@
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+"本程序为流式带通（截止频率为 None 时为低通/高通）滤波器，滤波器只设计一次，调用之间保留 sosfilt 的 zi 状态，每个新样本的代价为 O(1)，供单曝光脉搏波显示调用；输入为数组时各通道（如多个ROI）独立滤波"
+
+
+class StreamingFilter:
+    def __init__(self, lowcut, highcut, fs, order=2, fs_tolerance=0.05):
+        """
+        :param lowcut: 通带下限（Hz），为 None 时为低通
+        :param highcut: 通带上限（Hz），为 None 时为高通
+        :param fs: 初始采样率（Hz）
+        :param order: 巴特沃斯滤波器阶数
+        :param fs_tolerance: 采样率相对变化超过该比例时重新设计滤波器
+        """
+        self.lowcut = lowcut
+        self.highcut = highcut
+        self.order = order
+        self.fs_tolerance = fs_tolerance
+        self.fs = None
+        self.sos = None
+        self.zi = None
+        self._last = 0.0
+        self._design(fs)
+
+    def _design(self, fs):
+        """按采样率设计二阶节滤波器，上限截止频率不超过奈奎斯特频率"""
+        nyquist = 0.5 * fs
+        high = None if self.highcut is None else min(self.highcut / nyquist, 0.99)
+        if self.lowcut is None:
+            self.sos = butter(self.order, high, btype='low', output='sos')
+        elif high is None:
+            self.sos = butter(self.order, self.lowcut / nyquist, btype='high', output='sos')
+        else:
+            self.sos = butter(self.order, [self.lowcut / nyquist, high], btype='band', output='sos')
+        # 逐样本路径使用纯 Python 系数，避开 sosfilt 的调用开销
+        self._coeffs = [tuple(section) for section in self.sos.tolist()]
+        self.fs = fs
+        # 以稳态初始化，避免每次重建都出现启动瞬态
+        if self.zi is not None:
+            self.zi = self._steady_state(self._last)
+
+    def _steady_state(self, value):
+        """输入恒为 value 时的稳态 zi，多通道时形状为 (节数, 2, 通道数)，与 sosfilt(axis=0) 一致"""
+        zi = sosfilt_zi(self.sos)
+        value = np.asarray(value, dtype=float)
+        if value.ndim:
+            return zi[:, :, None] * value
+        return zi * value
+
+    def set_fs(self, fs):
+        """
+        更新有效采样率，变化超过 fs_tolerance 时重新设计滤波器
+        :return: 是否重建了滤波器
+        """
+        if fs is None or fs <= 2 * (self.lowcut or 0.0):
+            return False
+        if abs(fs - self.fs) / self.fs <= self.fs_tolerance:
+            return False
+        self._design(fs)
+        return True
+
+    def reset(self):
+        """清空滤波器状态，下一个样本重新按稳态初始化"""
+        self.zi = None
+        self._last = 0.0
+
+    def process(self, sample):
+        """
+        滤波一个新样本
+        :param sample: 新的处理值，非有限值（inf/nan）按上一个输入处理；为一维数组时每个元素是一个通道
+        :return: 滤波后的值
+        """
+        if np.ndim(sample):
+            return self._process_channels(sample)
+        if not np.isfinite(sample):
+            sample = self._last
+        if self.zi is None:
+            self.zi = sosfilt_zi(self.sos) * sample
+        # 直接 II 型转置结构，与 sosfilt 的状态定义相同
+        zi = self.zi
+        y = float(sample)
+        for i, (b0, b1, b2, _, a1, a2) in enumerate(self._coeffs):
+            z0, z1 = zi[i]
+            x = y
+            y = b0 * x + z0
+            zi[i, 0] = b1 * x - a1 * y + z1
+            zi[i, 1] = b2 * x - a2 * y
+        self._last = sample
+        return y
+
+    def _process_channels(self, samples):
+        x = np.asarray(samples, dtype=float)
+        if self.zi is not None:
+            x = np.where(np.isfinite(x), x, self._last)
+        if self.zi is None:
+            x = np.where(np.isfinite(x), x, 0.0)
+            self.zi = self._steady_state(x)
+        self._last = x
+        zi = self.zi
+        y = x
+        for i, (b0, b1, b2, _, a1, a2) in enumerate(self._coeffs):
+            x = y
+            y = b0 * x + zi[i, 0]
+            zi[i, 0] = b1 * x - a1 * y + zi[i, 1]
+            zi[i, 1] = b2 * x - a2 * y
+        return y
+
+    def process_block(self, samples):
+        """一次滤波多个新样本，状态与逐个调用 process 一致；多通道时形状为 (样本数, 通道数)"""
+        samples = np.asarray(samples, dtype=float)
+        if samples.size == 0:
+            return samples
+        samples = np.where(np.isfinite(samples), samples, np.nan)
+        # 非有限值沿用前一个有效输入
+        samples[0] = np.where(np.isnan(samples[0]), self._last, samples[0])
+        mask = np.isnan(samples)
+        if mask.any():
+            positions = np.arange(samples.shape[0]).reshape((-1,) + (1,) * (samples.ndim - 1))
+            idx = np.where(~mask, positions, 0)
+            np.maximum.accumulate(idx, axis=0, out=idx)
+            samples = np.take_along_axis(samples, idx, axis=0)
+        if self.zi is None:
+            self.zi = self._steady_state(samples[0])
+        y, self.zi = sosfilt(self.sos, samples, axis=0, zi=self.zi)
+        self._last = samples[-1]
+        return y
+
+
+class RateMeter:
+    def __init__(self, alpha=0.05, min_samples=10):
+        """
+        用帧时间戳估计实际采样率（指数滑动平均）
+        :param alpha: 平滑系数，越大跟踪越快
+        :param min_samples: 累计帧间隔数少于该值时不给出估计
+        """
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._last_t = None
+        self._dt = None
+        self._count = 0
+
+    def update(self, timestamp):
+        """
+        :param timestamp: 当前帧的时间戳（秒）
+        :return: 当前估计的采样率，数据不足时返回 None
+        """
+        if self._last_t is not None:
+            dt = timestamp - self._last_t
+            if dt > 0:
+                self._dt = dt if self._dt is None else (1 - self.alpha) * self._dt + self.alpha * dt
+                self._count += 1
+        self._last_t = timestamp
+        return self.rate
+
+    @property
+    def rate(self):
+        if self._count < self.min_samples:
+            return None
+        return 1.0 / self._dt
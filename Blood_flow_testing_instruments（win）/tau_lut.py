@@ -0,0 +1,98 @@
+import os
+import time
+
+import numpy as np
+
+from batch_lm import model_and_jacobian
+
+"本程序为单曝光 tau_c 反演查找表：固定 beta、p、v_noise 与曝光时间时 model_func_k 随 tao 单调，预先计算 k方-tao 表并缓存到磁盘，实时显示时插值查表"
+
+LUT_CACHE_DIR = "lut_cache"
+
+
+class TauLookup:
+    def __init__(self, exposure, p, v_noise, beta=0.25, tau_min=1e-3, tau_max=1e4, size=4096):
+        """
+        :param exposure: 当前曝光时间，单位与拟合时的 tao 一致（ms）
+        :param p: 动态散射比例（来自多曝光拟合）
+        :param v_noise: 噪声项（来自多曝光拟合）
+        :param beta: 相干因子
+        :param tau_min: 表的 tao 下限
+        :param tau_max: 表的 tao 上限
+        :param size: 表长度（对数等间隔）
+        """
+        self.exposure = float(exposure)
+        self.p = float(p)
+        self.v_noise = float(v_noise)
+        self.beta = float(beta)
+        self.log_tau = np.linspace(np.log(tau_min), np.log(tau_max), size)
+        params = np.column_stack([np.full(size, self.p), np.exp(self.log_tau), np.full(size, self.v_noise)])
+        k2, _ = model_and_jacobian(np.array([self.exposure]), params, self.beta)
+        # k方随 tao 单调递增，累积最大值消除数值上的微小回落，保证插值有效
+        self.k2 = np.maximum.accumulate(k2[:, 0])
+
+    @property
+    def key(self):
+        return (self.exposure, self.p, self.v_noise, self.beta)
+
+    def tau(self, k2):
+        """
+        k方 -> tau_c，支持标量与数组，超出表范围时取端点
+        """
+        return np.exp(np.interp(k2, self.k2, self.log_tau))
+
+    def ict(self, k2):
+        """k方 -> 逆相关时间 ICT = 1/tau_c"""
+        return np.exp(-np.interp(k2, self.k2, self.log_tau))
+
+    def save(self, path):
+        np.savez(path, key=np.array(self.key), log_tau=self.log_tau, k2=self.k2)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        lut = cls.__new__(cls)
+        lut.exposure, lut.p, lut.v_noise, lut.beta = (float(v) for v in data["key"])
+        lut.log_tau = data["log_tau"]
+        lut.k2 = data["k2"]
+        return lut
+
+    @classmethod
+    def load_or_build(cls, exposure, p, v_noise, beta=0.25, cache_dir=LUT_CACHE_DIR):
+        """
+        启动时调用：参数相同的表已缓存则直接读取，否则计算后写入缓存
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"tau_lut_T{exposure:g}_p{p:g}_v{v_noise:g}_b{beta:g}.npz")
+        if os.path.exists(path):
+            lut = cls.load(path)
+            if lut.key == (float(exposure), float(p), float(v_noise), float(beta)):
+                return lut
+        lut = cls(exposure, p, v_noise, beta)
+        lut.save(path)
+        print(f"已生成 tau_c 查找表: {path}")
+        return lut
+
+
+if __name__ == "__main__":
+    # 与逐样本数值求根对比耗时与精度
+    from scipy.optimize import brentq
+    from LM_cac import model_func_k
+
+    exposure, p, v_noise = 50.0, 0.6, 0.002
+    lut = TauLookup(exposure, p, v_noise)
+    rng = np.random.default_rng(0)
+    true_tau = np.exp(rng.uniform(np.log(0.5), np.log(500), 10000))
+    k2 = model_func_k(exposure, p, true_tau, v_noise)
+
+    start = time.perf_counter()
+    tau_lut = lut.tau(k2)
+    per_sample_lut = (time.perf_counter() - start) / k2.size
+
+    start = time.perf_counter()
+    tau_root = [brentq(lambda tao: model_func_k(exposure, p, tao, v_noise) - value, 1e-3, 1e4) for value in k2[:200]]
+    per_sample_root = (time.perf_counter() - start) / 200
+
+    print(f"查表: {per_sample_lut * 1e6:.3f} us/样本，求根: {per_sample_root * 1e6:.1f} us/样本")
+    print(f"查表相对误差最大 {np.max(np.abs(tau_lut - true_tau) / true_tau) * 100:.4f}%，"
+          f"与求根结果最大差 {np.max(np.abs(tau_lut[:200] - tau_root) / np.asarray(tau_root)) * 100:.4f}%")
@@ -9,6 +9,8 @@ from matplotlib import pyplot as plt
 from LM_cac import cac_LM
 from leaser_control import ComSetting
 from s_DSCA import cac_k
+from v4l2_control import device_path, get_device
+from camera_source import open_camera
 
 def set_roi(frame, roi_size=50):
     height, width, _ = frame.shape
@@ -18,16 +20,25 @@ def set_roi(frame, roi_size=50):
     y2 = y1 + roi_size
     return frame, (x1, y1, x2, y2)
 
-def set_exposure_time(exposure):
+def set_exposure_time(exposure, device="/dev/video0"):
     """
-    使用 v4l2-ctl 设置相机手动曝光时间。
+    设置相机手动曝光时间，优先通过常驻的 V4L2 ioctl 后端，打开设备失败时退回 v4l2-ctl。
     :param exposure: 曝光时间（微秒）
+    :return: 控件修改耗时（秒），使用 v4l2-ctl 时为 None
     """
-    cmd = f"v4l2-ctl -d /dev/video0 --set-ctrl=auto_exposure=0"  # 关闭自动曝光
+    dev = get_device(device)
+    if dev is not None:
+        latency = dev.set_exposure(exposure)
+        if latency is not None:
+            print(f"曝光设置为 {exposure}，耗时 {latency * 1000:.2f} ms")
+            return latency
+
+    cmd = f"v4l2-ctl -d {device} --set-ctrl=auto_exposure=0"  # 关闭自动曝光
     subprocess.run(cmd, shell=True)
 
-    cmd = f"v4l2-ctl -d /dev/video0 --set-ctrl=exposure_time_absolute={exposure}"
+    cmd = f"v4l2-ctl -d {device} --set-ctrl=exposure_time_absolute={exposure}"
     subprocess.run(cmd, shell=True)
+    return None
 
 def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, output_dir, num, leaser_powers, controller):
     """
@@ -49,11 +60,16 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
     k_average_all = []
 
     # 相机开机
-    cap = cv2.VideoCapture(camera_index)
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("Error: Unable to access the camera.")
         return
     cap.set(cv2.CAP_PROP_FPS, fps)
+    # OpenCV 打开相机时可能重置曝光控件，清空缓存，避免第一次曝光写入被误跳过
+    device = device_path(camera_index)
+    dev = get_device(device)
+    if dev is not None:
+        dev.invalidate()
 
     # 创建窗口并设置为持续显示模式
     cv2.namedWindow('Camera Feed', cv2.WINDOW_NORMAL)
@@ -61,7 +77,7 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
     # 根据曝光序列截取帧
     for idx, exposure in enumerate(exposure_times):
         # 设置曝光时间（通过 Linux 命令）
-        set_exposure_time(exposure * 1000)  # 转换为微秒（ms到us）
+        set_exposure_time(exposure * 1000, device)  # 转换为微秒（ms到us）
 
         # 根据序列设定激光器功率
         power = leaser_powers[idx]
@@ -108,6 +124,11 @@ def capture_images_with_exposure(camera_index, roi_size, fps, exposure_times, ou
     print("\n=== k 值数组 ===")
     print(["{:.4f}".format(float(x)) for x in k_average_all])  # k_average_all为所有k方的数组
 
+    dev = get_device(device)
+    if dev is not None:
+        count, mean_ms, max_ms = dev.latency_summary()
+        print(f"曝光控件写入 {count} 次，平均耗时 {mean_ms:.2f} ms，最大 {max_ms:.2f} ms")
+
     # 关闭窗口
     cv2.destroyAllWindows()
     cap.release()
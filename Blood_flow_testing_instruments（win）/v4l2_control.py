@@ -0,0 +1,258 @@
+import ctypes
+import os
+import time
+
+"本程序为进程内 V4L2 控制后端，只打开一次 /dev/videoN，通过 ioctl 设置曝光、格式与帧率，缓存当前控件值跳过重复写入，并记录每次控件修改的耗时，替代每次调用 v4l2-ctl"
+
+try:
+    import fcntl
+except ImportError:  # win 平台没有 fcntl，只能使用 OpenCV 的相机属性
+    fcntl = None
+
+# videodev2.h 中的常量
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_FIELD_ANY = 0
+V4L2_CID_EXPOSURE_AUTO = 0x009a0901
+V4L2_CID_EXPOSURE_ABSOLUTE = 0x009a0902
+V4L2_EXPOSURE_AUTO = 0
+V4L2_EXPOSURE_MANUAL = 1
+
+
+class v4l2_control(ctypes.Structure):
+    _fields_ = [("id", ctypes.c_uint32), ("value", ctypes.c_int32)]
+
+
+class v4l2_queryctrl(ctypes.Structure):
+    _fields_ = [
+        ("id", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("name", ctypes.c_char * 32),
+        ("minimum", ctypes.c_int32),
+        ("maximum", ctypes.c_int32),
+        ("step", ctypes.c_int32),
+        ("default_value", ctypes.c_int32),
+        ("flags", ctypes.c_uint32),
+        ("reserved", ctypes.c_uint32 * 2),
+    ]
+
+
+class v4l2_pix_format(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_uint32),
+        ("height", ctypes.c_uint32),
+        ("pixelformat", ctypes.c_uint32),
+        ("field", ctypes.c_uint32),
+        ("bytesperline", ctypes.c_uint32),
+        ("sizeimage", ctypes.c_uint32),
+        ("colorspace", ctypes.c_uint32),
+        ("priv", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("ycbcr_enc", ctypes.c_uint32),
+        ("quantization", ctypes.c_uint32),
+        ("xfer_func", ctypes.c_uint32),
+    ]
+
+
+class _v4l2_format_union(ctypes.Union):
+    # 内核联合体中含指针（v4l2_window），对齐方式随平台字长变化，用 c_void_p 保持一致
+    _fields_ = [("pix", v4l2_pix_format), ("raw_data", ctypes.c_uint8 * 200), ("_align", ctypes.c_void_p)]
+
+
+class v4l2_format(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("fmt", _v4l2_format_union)]
+
+
+class v4l2_fract(ctypes.Structure):
+    _fields_ = [("numerator", ctypes.c_uint32), ("denominator", ctypes.c_uint32)]
+
+
+class v4l2_captureparm(ctypes.Structure):
+    _fields_ = [
+        ("capability", ctypes.c_uint32),
+        ("capturemode", ctypes.c_uint32),
+        ("timeperframe", v4l2_fract),
+        ("extendedmode", ctypes.c_uint32),
+        ("readbuffers", ctypes.c_uint32),
+        ("reserved", ctypes.c_uint32 * 4),
+    ]
+
+
+class _v4l2_streamparm_union(ctypes.Union):
+    _fields_ = [("capture", v4l2_captureparm), ("raw_data", ctypes.c_uint8 * 200)]
+
+
+class v4l2_streamparm(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("parm", _v4l2_streamparm_union)]
+
+
+def _iowr(nr, struct):
+    """_IOWR('V', nr, struct)"""
+    return (3 << 30) | (ctypes.sizeof(struct) << 16) | (ord('V') << 8) | nr
+
+
+VIDIOC_G_FMT = _iowr(4, v4l2_format)
+VIDIOC_S_FMT = _iowr(5, v4l2_format)
+VIDIOC_S_PARM = _iowr(22, v4l2_streamparm)
+VIDIOC_G_CTRL = _iowr(27, v4l2_control)
+VIDIOC_S_CTRL = _iowr(28, v4l2_control)
+VIDIOC_QUERYCTRL = _iowr(36, v4l2_queryctrl)
+
+
+def fourcc(code):
+    return sum(ord(c) << (8 * i) for i, c in enumerate(code))
+
+
+class V4L2Device:
+    def __init__(self, device="/dev/video0"):
+        """
+        :param device: 设备节点，打开后在对象生命周期内保持
+        """
+        self.device = device
+        self.fd = None
+        self._cache = {}  # 控件 id -> 最近一次写入/读取的值
+        self.latencies = []  # (控件 id, 值, 耗时秒)
+        self.last_latency = None
+
+    def open(self):
+        if fcntl is None:
+            print("当前平台不支持 V4L2 ioctl")
+            return False
+        try:
+            self.fd = os.open(self.device, os.O_RDWR | os.O_NONBLOCK)
+            return True
+        except OSError as e:
+            print(f"打开 {self.device} 失败: {e}")
+            self.fd = None
+            return False
+
+    def invalidate(self):
+        """
+        清空控件缓存：OpenCV 打开或重新配置相机时驱动可能重置控件（如 auto_exposure），
+        之后的第一次写入不能因缓存相同而被跳过
+        """
+        self._cache.clear()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self._cache.clear()
+
+    @property
+    def is_open(self):
+        return self.fd is not None
+
+    def get_control(self, control_id):
+        ctrl = v4l2_control(control_id, 0)
+        fcntl.ioctl(self.fd, VIDIOC_G_CTRL, ctrl)
+        self._cache[control_id] = ctrl.value
+        return ctrl.value
+
+    def query_control(self, control_id):
+        """:return: (最小值, 最大值, 步长, 默认值)"""
+        query = v4l2_queryctrl()
+        query.id = control_id
+        fcntl.ioctl(self.fd, VIDIOC_QUERYCTRL, query)
+        return query.minimum, query.maximum, query.step, query.default_value
+
+    def set_control(self, control_id, value):
+        """
+        设置控件，值与缓存相同时不写入
+        :return: 本次写入耗时（秒），跳过时为 0，失败时为 None
+        """
+        value = int(value)
+        if self._cache.get(control_id) == value:
+            return 0.0
+
+        ctrl = v4l2_control(control_id, value)
+        start = time.perf_counter()
+        try:
+            fcntl.ioctl(self.fd, VIDIOC_S_CTRL, ctrl)
+        except OSError as e:
+            print(f"设置控件 0x{control_id:08x}={value} 失败: {e}")
+            self._cache.pop(control_id, None)
+            return None
+        latency = time.perf_counter() - start
+
+        self._cache[control_id] = value
+        self.last_latency = latency
+        self.latencies.append((control_id, value, latency))
+        return latency
+
+    def set_exposure(self, exposure):
+        """
+        关闭自动曝光并设置绝对曝光值（单位与 exposure_time_absolute 相同）
+        :return: 两次控件修改的总耗时（秒），失败时为 None
+        """
+        latency_auto = self.set_control(V4L2_CID_EXPOSURE_AUTO, V4L2_EXPOSURE_MANUAL)
+        latency_exposure = self.set_control(V4L2_CID_EXPOSURE_ABSOLUTE, exposure)
+        if latency_auto is None or latency_exposure is None:
+            return None
+        return latency_auto + latency_exposure
+
+    def set_format(self, width, height, pixelformat="MJPG"):
+        fmt = v4l2_format()
+        fmt.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        fcntl.ioctl(self.fd, VIDIOC_G_FMT, fmt)
+        fmt.fmt.pix.width = width
+        fmt.fmt.pix.height = height
+        fmt.fmt.pix.pixelformat = fourcc(pixelformat)
+        fmt.fmt.pix.field = V4L2_FIELD_ANY
+        fcntl.ioctl(self.fd, VIDIOC_S_FMT, fmt)
+        return fmt.fmt.pix.width, fmt.fmt.pix.height
+
+    def set_fps(self, fps):
+        parm = v4l2_streamparm()
+        parm.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        parm.parm.capture.timeperframe.numerator = 1
+        parm.parm.capture.timeperframe.denominator = int(fps)
+        fcntl.ioctl(self.fd, VIDIOC_S_PARM, parm)
+        timeperframe = parm.parm.capture.timeperframe
+        return timeperframe.denominator / max(timeperframe.numerator, 1)
+
+    def latency_summary(self):
+        """:return: (写入次数, 平均耗时毫秒, 最大耗时毫秒)"""
+        if not self.latencies:
+            return 0, 0.0, 0.0
+        values = [latency for _, _, latency in self.latencies]
+        return len(values), sum(values) / len(values) * 1000, max(values) * 1000
+
+
+_devices = {}
+
+
+def device_path(camera_index):
+    """相机编号 -> 设备节点，已是路径时原样返回"""
+    if isinstance(camera_index, int):
+        return f"/dev/video{camera_index}"
+    return camera_index
+
+
+def get_device(device="/dev/video0"):
+    """获取进程内共享的设备对象，首次调用时打开，失败返回 None"""
+    dev = _devices.get(device)
+    if dev is not None and dev.is_open:
+        return dev
+    dev = V4L2Device(device)
+    if not dev.open():
+        return None
+    _devices[device] = dev
+    return dev
+
+
+def configure_capture(fps, size, pixelformat="MJPG", device="/dev/video0"):
+    """
+    设置采集格式与帧率，需在 OpenCV 打开相机之前调用
+    :return: 是否设置成功
+    """
+    dev = get_device(device)
+    if dev is None:
+        return False
+    try:
+        width, height = dev.set_format(size, size, pixelformat)
+        actual_fps = dev.set_fps(fps)
+    except OSError as e:
+        print(f"设置失败: {e}")
+        return False
+    print(f"分辨率 {width}x{height}，帧率已设置为 {actual_fps:g}")
+    return True
@@ -1,18 +1,21 @@
 import cv2
-import numpy as np
 import time
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import subprocess
 from leaser_control import ComSetting
-from scipy.signal import butter, sosfilt
-from collections import deque
+from v4l2_control import configure_capture
+from camera_source import open_camera
+from capture_worker import CaptureWorker
+from speckle_stats import speckle_stats
+from resampler import StreamResampler
+from filterbank import FilterBank
+from heart_rate import StreamingHeartRate
+from autoscale import AxisAutoscaler
 
-# 维护全局变量，存储最近的 Y 轴范围
-prev_y_min, prev_y_max = None, None
-adjust_threshold = 0.05  # 设定一个变化阈值（10%）
-smoothing_factor = 0.95  # 0.8 表示新的数据占主导，降低突变影响
-y_locked = False  # 是否锁定 Y 轴
+# 滤波器组的输入通道：0 为衬比值（同 s_DSCA 的 data_type），1 为 -均值
+CONTRAST_CHANNEL = 0
+INTENSITY_CHANNEL = 1
 
 
 def camera_initial(fps, size):
@@ -21,6 +24,10 @@ def camera_initial(fps, size):
     :param size: 画面大小
     :param fps: 帧率
     """
+    # 优先通过进程内 ioctl 设置，不可用时再调用 v4l2-ctl
+    if configure_capture(fps, size):
+        return
+
     command_size = f"v4l2-ctl --set-fmt-video=width={size},height={size},pixelformat=MJPG"
     command_fps = f"v4l2-ctl --set-parm={fps}"
 
@@ -32,89 +39,30 @@ def camera_initial(fps, size):
         print(f"设置失败: {e.stderr}")
 
 
-def update_y_axis(ax, filtered_y_data):
-    global prev_y_min, prev_y_max
-
-    if len(filtered_y_data) < 180:
-        return  # 数据不足 60 帧，不调整
-
-    # 取最近 30 帧数据
-    recent_data = list(filtered_y_data)[-80:]
-    y_min, y_max = min(recent_data), max(recent_data)
-
-    # 计算 margin（增加一定的边界余量）
-    margin = (y_max - y_min) * 1.3
-    y_center = (y_max + y_min) / 2
-
-    # **判断是否需要更新 Y 轴范围**
-    if prev_y_min is not None and prev_y_max is not None:
-        # 计算相对变化比例
-        min_change = abs(y_min - prev_y_min) / max(abs(prev_y_min), 1e-5)
-        max_change = abs(y_max - prev_y_max) / max(abs(prev_y_max), 1e-5)
-
-        if min_change < adjust_threshold and max_change < adjust_threshold:
-            return  # 变化小于 20%，不调整
-
-    # **平滑更新 Y 轴范围**
-    if prev_y_min is not None and prev_y_max is not None:
-        y_min = smoothing_factor * y_min + (1 - smoothing_factor) * prev_y_min
-        y_max = smoothing_factor * y_max + (1 - smoothing_factor) * prev_y_max
-
-    # 更新 Y 轴范围
-    ax.set_ylim(y_min - margin, y_max + margin)
-
-    # 存储上一次的 Y 轴范围
-    prev_y_min, prev_y_max = y_min, y_max
-
-
-def draw_roi(frame, roi_size=50):
-    height, width, _ = frame.shape
-    x1 = (width - roi_size) // 2
-    y1 = (height - roi_size) // 2
-    x2 = x1 + roi_size
-    y2 = y1 + roi_size
-    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-    return frame, (x1, y1, x2, y2)
-
-
-def cac_k(roi_frame, sign):
-    gray_roi = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
-    mean_i = np.mean(gray_roi)
-    std_i = np.std(gray_roi)
-    K = std_i / mean_i
-    if sign == 0:
-        if K != 0:
-            return -1 / (K ** 2)
-        else:
-            return float('inf')
-    elif sign == 1:
-        return -K
-    elif sign == 2:
-        return -K ** 2
-    elif sign == 3:
-        return -mean_i
-
-def butter_bandpass_sos(lowcut, highcut, fs, order=2):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
+def contrast_value(stats, data_type):
+    """与 s_DSCA.cac_k 的 sign 含义相同，由一次 speckle_stats 的结果得到"""
+    if data_type == 0:
+        return -stats.inv_k2
+    elif data_type == 1:
+        return -stats.k
+    elif data_type == 2:
+        return -stats.k2
+    return -stats.mean
 
-    # 返回二阶节滤波器（sos），而不是 (b, a)
-    sos = butter(order, [low, high], btype='band', output='sos')
-    return sos
 
-
-def bandpass_filter(data, lowcut, highcut, fs, order=2):
-    sos = butter_bandpass_sos(lowcut, highcut, fs, order)
-    return sosfilt(sos, data)  # 用 sos 滤波器处理数据
-
-
-def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
+def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_size=50, plot_interval=50,
+           pulse_window_s=10, breath_window_s=60, breath_channel=INTENSITY_CHANNEL):
+    """
+    一次采集同时显示脉搏与呼吸：每帧只计算一次ROI统计量，衬比与光强两个通道经同一组滤波器
+    :param data_type: 脉搏通道使用的衬比值，同 s_DSCA
+    :param pulse_window_s: 脉搏波显示的时间窗（秒）
+    :param breath_window_s: 呼吸波与趋势显示的时间窗（秒）
+    :param breath_channel: 呼吸波取自哪个通道，默认 -均值
+    """
     # 初始化相机
-    # 初始化曝光值
     camera_initial(fps, size)
 
-    cap = cv2.VideoCapture(camera_index)
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("无法打开相机")
         return
@@ -129,72 +77,95 @@ def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_s
 
     controller.set_power_state(initial_power)
 
-    # 初始化图形数据
-    x_data = deque(maxlen=1000)  # 使用 deque 实现 FIFO 结构
-    y_data = deque(maxlen=1000)  # 使用 deque 实现 FIFO 结构
-    frame_count = 0
-    k_squared_values = deque(maxlen=33)  # 用于存储前33帧的 k^2 值
-    fig, ax = plt.subplots()
-    line, = ax.plot([], [], 'r-')
-    ax.set_xlabel("fps(60/s)")
-    ax.set_ylabel("-1/k^2")
+    # 采集线程每帧计算一次统计量，同时给出衬比与光强两个通道
+    def stats_func(roi_frame):
+        stats = speckle_stats(roi_frame)
+        return contrast_value(stats, data_type), -stats.mean
+
+    worker = CaptureWorker(cap, roi_size, stats_func, n_fields=2)
+    worker.start()
+    last_seq = 0
+
+    # 按时间戳重采样到均匀网格后送入脉搏/呼吸/趋势滤波器组，各频带写入并行的环形缓冲区
+    resampler = StreamResampler()
+    bank = FilterBank(fps, n_channels=2, capacity=int(breath_window_s * fps * 2))
+    heart_rate = StreamingHeartRate()
+    breath_rate = StreamingHeartRate(band=(0.1, 0.5), bin_spacing=0.005, time_constant=15.0)
+
+    fig, (ax_pulse, ax_breath, ax_trend) = plt.subplots(3, 1, figsize=(10, 8))
+    pulse_line, = ax_pulse.plot([], [], 'r-')
+    breath_line, = ax_breath.plot([], [], 'b-')
+    trend_line, = ax_trend.plot([], [], 'k-')
+    ax_pulse.set_ylabel("pulse")
+    ax_breath.set_ylabel("breathing")
+    ax_trend.set_ylabel("trend")
+    ax_trend.set_xlabel("time (s)")
+    ax_pulse.set_xlim(-pulse_window_s, 0)
+    ax_breath.set_xlim(-breath_window_s, 0)
+    ax_trend.set_xlim(-breath_window_s, 0)
+    # 每个坐标轴各自的自动缩放，窗口与显示时间窗一致
+    scalers = {
+        "cardiac": AxisAutoscaler(ax_pulse, window=int(pulse_window_s * fps), min_samples=80),
+        "respiratory": AxisAutoscaler(ax_breath, window=int(breath_window_s * fps), min_samples=180),
+        "trend": AxisAutoscaler(ax_trend, window=int(breath_window_s * fps), min_samples=180),
+    }
+    rate_text = ax_pulse.text(0.01, 0.95, "", transform=ax_pulse.transAxes, va='top')
+    artists = (pulse_line, breath_line, trend_line, rate_text)
 
     def update_plot(frame_num):
-        global y_locked
-        nonlocal x_data, y_data, frame_count, k_squared_values  # 允许修改外部作用域的变量
-        ret, frame = cap.read()
-        if not ret:
-            return line,
+        nonlocal last_seq
 
-        # 按键检测并实时调整曝光
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):  # 退出程序
             plt.close(fig)
+            worker.stop()
             cap.release()
             cv2.destroyAllWindows()
-            time.sleep(1)
             # 关闭激光器
             controller.send_data(controller.close_cmd)
             time.sleep(1)
-            # 关闭串口
             controller.close_serial()
             print("串口已关闭")
-            return line,
-
-        # 处理每一帧并计算处理值
-        frame_with_roi, (x1, y1, x2, y2) = draw_roi(frame, roi_size=roi_size)
-        roi_frame = frame[y1:y2, x1:x2]
-
-        # 计算处理值
-        processing_value = cac_k(roi_frame, data_type)
-
-        x_data.append(len(x_data))
-        y_data.append(processing_value)
-        k_squared_values.append(processing_value)
-
-        # 应用低通滤波器来平滑数据
-        if len(y_data) > 60:
-            filtered_y_data = bandpass_filter(list(y_data), 0.5, 5, 30, 2)
-            filtered_y_data = deque(filtered_y_data, maxlen=270)  # 确保是 deque
-        else:
-            filtered_y_data = y_data
-
-        # **调整纵坐标（每 30 帧更新一次，使用最新 30 帧数据）**
-        update_y_axis(ax, y_data)
-
-        # **更新绘图**
-        line.set_data(range(len(x_data)), y_data)
-        ax.set_xlim(60, max(1000, len(x_data)))
-
-        # 显示视频流
-        #cv2.imshow('Camera Feed', frame_with_roi)
-
-        return line,
-
-    # 使用 FuncAnimation 进行实时绘图
-    ani = FuncAnimation(fig, update_plot, blit=True, interval=16.67,save_count=1000)  # 60帧每秒，间隔16.67ms
+            print(f"丢帧数: {worker.dropped_frames}")
+            return artists
+
+        timestamps, values, last_seq, _ = worker.buffer.read_since(last_seq)
+        if len(timestamps) == 0:
+            return artists
+
+        for timestamp, sample in zip(timestamps, values):
+            for grid_t, grid_value in resampler.process(timestamp, sample):
+                bank.set_fs(resampler.fs)
+                bands = bank.process(grid_t, grid_value)
+                scalers["cardiac"].push(bands["cardiac"][CONTRAST_CHANNEL])
+                scalers["respiratory"].push(bands["respiratory"][breath_channel])
+                scalers["trend"].push(bands["trend"][CONTRAST_CHANNEL])
+                heart_rate.update(grid_t, bands["cardiac"][CONTRAST_CHANNEL])
+                breath_rate.update(grid_t, bands["respiratory"][breath_channel])
+        if resampler.fs is None:
+            return artists
+
+        for line, name, channel, window_s in (
+                (pulse_line, "cardiac", CONTRAST_CHANNEL, pulse_window_s),
+                (breath_line, "respiratory", breath_channel, breath_window_s),
+                (trend_line, "trend", CONTRAST_CHANNEL, breath_window_s)):
+            t, y = bank.latest(name, int(window_s * resampler.fs), channel)
+            if len(t) == 0:
+                continue
+            line.set_data(t - t[-1], y)
+            scalers[name].update()
+
+        pulse_text = f"{heart_rate.bpm:.0f} BPM" if heart_rate.bpm is not None else "-- BPM"
+        breath_text = f"{breath_rate.bpm:.1f} breaths/min" if breath_rate.bpm is not None else "-- breaths/min"
+        rate_text.set_text(f"{pulse_text}   {breath_text}   {resampler.rate or 0:.1f} fps")
+        return artists
+
+    # 使用 FuncAnimation 进行实时绘图，刷新间隔与相机帧率无关
+    ani = FuncAnimation(fig, update_plot, blit=False, interval=plot_interval, save_count=1000)
+    plt.tight_layout()
     plt.show()
+    worker.stop()
 
 
 if __name__ == "__main__":
-    s_DSCA(data_type=3,initial_power=300, camera_index=0, fps=60, size=496, roi_size=100)
\ No newline at end of file
+    s_DSCA(data_type=0, initial_power=300, camera_index=0, fps=60, size=496, roi_size=100)
@@ -5,23 +5,31 @@ import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import subprocess
 from leaser_control import ComSetting
-from scipy.signal import butter, sosfilt
 from collections import deque
+from stream_filter import StreamingFilter
+from resampler import StreamResampler
+from v4l2_control import configure_capture
+from capture_worker import CaptureWorker
+from camera_source import open_camera
+from gray_capture import GrayCapture
+from speckle_stats import to_gray
+from autoscale import AxisAutoscaler
 
-# 维护全局变量，存储最近的 Y 轴范围
-prev_y_min, prev_y_max = None, None
-adjust_threshold = 0.05  # 设定一个变化阈值（10%）
-smoothing_factor = 0.95  # 0.8 表示新的数据占主导，降低突变影响
 y_locked = False  # 是否锁定 Y 轴
 
 
-def camera_initial(fps, size):
+def camera_initial(fps, size, pixelformat="MJPG"):
     """
     设置摄像头曝光值
     :param size: 画面大小
     :param fps: 帧率
+    :param pixelformat: "MJPG" 或 "YUYV"
     """
-    command_size = f"v4l2-ctl --set-fmt-video=width={size},height={size},pixelformat=MJPG"
+    # 优先通过进程内 ioctl 设置，不可用时再调用 v4l2-ctl
+    if configure_capture(fps, size, pixelformat):
+        return
+
+    command_size = f"v4l2-ctl --set-fmt-video=width={size},height={size},pixelformat={pixelformat}"
     command_fps = f"v4l2-ctl --set-parm={fps}"
 
     try:
@@ -32,43 +40,8 @@ def camera_initial(fps, size):
         print(f"设置失败: {e.stderr}")
 
 
-def update_y_axis(ax, filtered_y_data):
-    global prev_y_min, prev_y_max
-
-    if len(filtered_y_data) < 80:
-        return  # 数据不足 60 帧，不调整
-
-    # 取最近 30 帧数据
-    recent_data = list(filtered_y_data)[-80:]
-    y_min, y_max = min(recent_data), max(recent_data)
-
-    # 计算 margin（增加一定的边界余量）
-    margin = (y_max - y_min) * 1.3
-    y_center = (y_max + y_min) / 2
-
-    # **判断是否需要更新 Y 轴范围**
-    if prev_y_min is not None and prev_y_max is not None:
-        # 计算相对变化比例
-        min_change = abs(y_min - prev_y_min) / max(abs(prev_y_min), 1e-5)
-        max_change = abs(y_max - prev_y_max) / max(abs(prev_y_max), 1e-5)
-
-        if min_change < adjust_threshold and max_change < adjust_threshold:
-            return  # 变化小于 20%，不调整
-
-    # **平滑更新 Y 轴范围**
-    if prev_y_min is not None and prev_y_max is not None:
-        y_min = smoothing_factor * y_min + (1 - smoothing_factor) * prev_y_min
-        y_max = smoothing_factor * y_max + (1 - smoothing_factor) * prev_y_max
-
-    # 更新 Y 轴范围
-    ax.set_ylim(y_min - margin, y_max + margin)
-
-    # 存储上一次的 Y 轴范围
-    prev_y_min, prev_y_max = y_min, y_max
-
-
 def draw_roi(frame, roi_size=50):
-    height, width, _ = frame.shape
+    height, width = frame.shape[:2]
     x1 = (width - roi_size) // 2
     y1 = (height - roi_size) // 2
     x2 = x1 + roi_size
@@ -78,7 +51,7 @@ def draw_roi(frame, roi_size=50):
 
 
 def cac_k(roi_frame, sign):
-    gray_roi = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
+    gray_roi = to_gray(roi_frame)
     mean_i = np.mean(gray_roi)
     std_i = np.std(gray_roi)
     K = std_i / mean_i
@@ -94,30 +67,23 @@ def cac_k(roi_frame, sign):
     elif sign == 3:
         return -mean_i
 
-def butter_bandpass_sos(lowcut, highcut, fs, order=2):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-
-    # 返回二阶节滤波器（sos），而不是 (b, a)
-    sos = butter(order, [low, high], btype='band', output='sos')
-    return sos
-
-
-def bandpass_filter(data, lowcut, highcut, fs, order=2):
-    sos = butter_bandpass_sos(lowcut, highcut, fs, order)
-    return sosfilt(sos, data)  # 用 sos 滤波器处理数据
-
-
-def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
+def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_size=50, plot_interval=50,
+           gray_decode=False, pixelformat="MJPG"):
+    """
+    :param gray_decode: True 时跳过 RGB 转换直接采集灰度帧（见 gray_capture.py），树莓派上 CPU 是瓶颈
+    :param pixelformat: 相机输出格式，gray_decode 时 "YUYV" 只取 Y 平面，"MJPG" 只解码亮度分量
+    """
     # 初始化相机
     # 初始化曝光值
-    camera_initial(fps, size)
+    camera_initial(fps, size, pixelformat)
 
-    cap = cv2.VideoCapture(camera_index)
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("无法打开相机")
         return
+    gray_cap = None
+    if gray_decode:
+        cap = gray_cap = GrayCapture(cap, pixelformat)
 
     controller = ComSetting()
     port_name = "/dev/ttyACM0"
@@ -132,24 +98,33 @@ def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_s
     # 初始化图形数据
     x_data = deque(maxlen=270)  # 使用 deque 实现 FIFO 结构
     y_data = deque(maxlen=270)  # 使用 deque 实现 FIFO 结构
+    filtered_y_data = deque(maxlen=270)
+    # 样本按采集时间戳重采样到均匀网格，网格采样率锁定为实测帧率，供电不足降帧时截止频率不随之偏移
+    resampler = StreamResampler()
+    pulse_filter = StreamingFilter(0.5, 4, fps, 2)
     frame_count = 0
     k_squared_values = deque(maxlen=33)  # 用于存储前33帧的 k^2 值
     fig, ax = plt.subplots()
     line, = ax.plot([], [], 'r-')
     ax.set_xlabel("fps(60/s)")
     ax.set_ylabel("-1/k^2")
+    # Y 轴范围只在窗口极值变化超过阈值时调整，状态保存在该坐标轴自己的对象里
+    y_scaler = AxisAutoscaler(ax)
+
+    # 采集线程以相机全帧率计算处理值，绘图按 plot_interval 读取新样本，渲染卡顿不再影响采样
+    worker = CaptureWorker(cap, roi_size, lambda roi_frame: (cac_k(roi_frame, data_type),))
+    worker.start()
+    last_seq = 0
 
     def update_plot(frame_num):
         global y_locked
-        nonlocal x_data, y_data, frame_count, k_squared_values  # 允许修改外部作用域的变量
-        ret, frame = cap.read()
-        if not ret:
-            return line,
+        nonlocal x_data, y_data, frame_count, k_squared_values, last_seq  # 允许修改外部作用域的变量
 
         # 按键检测并实时调整曝光
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):  # 退出程序
             plt.close(fig)
+            worker.stop()
             cap.release()
             cv2.destroyAllWindows()
             time.sleep(1)
@@ -159,41 +134,54 @@ def s_DSCA(data_type=0,initial_power=50, camera_index=0, fps=60, size=496, roi_s
             # 关闭串口
             controller.close_serial()
             print("串口已关闭")
+            print(f"丢帧数: {worker.dropped_frames}")
+            if gray_cap is not None and gray_cap.decode_cpu_ms is not None:
+                print(f"灰度解码 CPU 时间: {gray_cap.decode_cpu_ms:.2f} ms/帧")
             return line,
 
-        # 处理每一帧并计算处理值
-        frame_with_roi, (x1, y1, x2, y2) = draw_roi(frame, roi_size=roi_size)
-        roi_frame = frame[y1:y2, x1:x2]
-
-        # 计算处理值
-        processing_value = cac_k(roi_frame, data_type)
+        # 读取采集线程新写入的处理值
+        timestamps, values, last_seq, _ = worker.buffer.read_since(last_seq)
+        if len(timestamps) == 0:
+            return line,
 
-        x_data.append(len(x_data))
-        y_data.append(processing_value)
-        k_squared_values.append(processing_value)
+        for timestamp, processing_value in zip(timestamps, values[:, 0]):
+            k_squared_values.append(processing_value)
+            for _, grid_value in resampler.process(timestamp, processing_value):
+                x_data.append(len(x_data))
+                y_data.append(grid_value)
 
-        # 应用低通滤波器来平滑数据
-        if len(y_data) > 60:
-            filtered_y_data = bandpass_filter(list(y_data), 0.5, 4, fps+3, 2)
-            filtered_y_data = deque(filtered_y_data, maxlen=500)  # 确保是 deque
-        else:
-            filtered_y_data = y_data
+                # 流式带通滤波，每个网格样本只处理一次
+                pulse_filter.set_fs(resampler.fs)
+                filtered_value = pulse_filter.process(grid_value)
+                filtered_y_data.append(filtered_value)
+                y_scaler.push(filtered_value)
 
         # **调整纵坐标（每 30 帧更新一次，使用最新 30 帧数据）**
-        update_y_axis(ax, filtered_y_data)
+        limits_changed = y_scaler.update()
 
         # **更新绘图**
         line.set_data(range(len(x_data)), filtered_y_data)
-        ax.set_xlim(100, max(270, len(x_data)))
+        x_limits = (100, max(270, len(x_data)))
+        if ax.get_xlim() != x_limits:
+            ax.set_xlim(*x_limits)
+            limits_changed = True
+        if limits_changed:
+            # blit 只重绘曲线，坐标轴范围变化后刻度与标签需要整幅重绘
+            fig.canvas.draw_idle()
 
         # 显示视频流
         #cv2.imshow('Camera Feed', frame_with_roi)
 
         return line,
 
-    # 使用 FuncAnimation 进行实时绘图
-    ani = FuncAnimation(fig, update_plot, blit=True, interval=16.67,save_count=500)  # 60帧每秒，间隔16.67ms
-    plt.show()
+    # 使用 FuncAnimation 进行实时绘图，刷新间隔与相机帧率无关
+    ani = FuncAnimation(fig, update_plot, blit=True, interval=plot_interval, save_count=500)
+    try:
+        plt.show()
+    finally:
+        # 直接关闭绘图窗口时也要释放相机
+        worker.stop()
+        cap.release()
 
 
 if __name__ == "__main__":
@@ -4,27 +4,26 @@ import time
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import subprocess
-from scipy.signal import butter, sosfilt
 from collections import deque
-from scipy.fft import fft, fftfreq
 from leaser_control import ComSetting
-from s_DSCA import update_y_axis
+from stream_filter import StreamingFilter
+from resampler import StreamResampler
+from v4l2_control import configure_capture
+from camera_source import open_camera
+from autoscale import AxisAutoscaler
 from camera_control import calculate_fps
+from heart_rate import StreamingHeartRate
+from beat_detector import BeatDetector
 
-# Global variables for y-axis adjustment
-prev_y_min, prev_y_max = None, None
-adjust_threshold = 0.05
-smoothing_factor = 0.95
 y_locked = False
 
-# FFT parameters
-fft_window_size = 300
-#sample_rate = 30  # Sampling rate (same as fps)
-last_update_time = time.time()
-
 
 def camera_initial(fps, size):
     """Set camera parameters"""
+    # Prefer the in-process ioctl backend, fall back to v4l2-ctl
+    if configure_capture(fps, size):
+        return
+
     command_size = f"v4l2-ctl --set-fmt-video=width={size},height={size},pixelformat=MJPG"
     command_fps = f"v4l2-ctl --set-parm={fps}"
 
@@ -67,53 +66,10 @@ def cac_k(roi_frame, sign):
         return 50 - mean_i
 
 
-def butter_bandpass_sos(lowcut, highcut, fs, order=2):
-    """Design bandpass filter"""
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    sos = butter(order, [low, high], btype='band', output='sos')
-    return sos
-
-
-def bandpass_filter(data, lowcut, highcut, fs, order=2):
-    """Apply bandpass filter"""
-    sos = butter_bandpass_sos(lowcut, highcut, fs, order)
-    return sosfilt(sos, data)
-
-
-def compute_fft(data, sample_rate):
-    """计算FFT，精度达到0.02Hz"""
-    n = len(data)
-    if n < 2:
-        return np.array([]), np.array([])
-
-    # 方法1：增加采样点数（需要至少5秒数据）
-    desired_resolution = 0.02  # 0.02Hz精度
-    required_n = int(sample_rate / desired_resolution)
-
-    # 如果数据不足，使用零填充
-    if n < required_n:
-        padded_data = np.zeros(required_n)
-        padded_data[:n] = data  # 前面填充原始数据
-    else:
-        padded_data = data
-
-    # 使用汉宁窗减少频谱泄漏
-    window = np.hanning(len(padded_data))
-    windowed_data = padded_data * window
-
-    # 计算FFT
-    yf = fft(windowed_data)
-    xf = fftfreq(len(padded_data), 1 / sample_rate)[:len(padded_data) // 2]
-
-    return xf, 2.0 / n * np.abs(yf[0:len(padded_data) // 2])
-
-
 def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_size=50):
     """Main function with FPS monitoring and counter reset"""
     camera_initial(fps, size)
-    cap = cv2.VideoCapture(camera_index)
+    cap = open_camera(camera_index)
     if not cap.isOpened():
         print("Camera not available")
         return
@@ -129,10 +85,17 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
     # Initialize data containers
     x_data = deque(maxlen=500)
     y_data = deque(maxlen=500)
+    filtered_y_data = deque(maxlen=500)
+    # Samples are resampled onto a uniform grid by capture timestamp; the grid rate locks to the
+    # measured frame rate, so filter cutoffs and BPM stay correct when the frame rate sags
+    resampler = StreamResampler()
+    pulse_filter = StreamingFilter(0.5, 4, fps, 2)
     frame_count = 0
     k_squared_values = deque(maxlen=33)
-    peak_freq = 0.0
-    last_peak_update = 0
+    # Streaming heart-rate estimate from measured frame timestamps, updated every frame
+    heart_rate = StreamingHeartRate()
+    # Beat-by-beat detection, each beat is reported within max_latency of its peak
+    beat_detector = BeatDetector()
 
     # FPS monitoring variables
     fps_counter = 0
@@ -150,6 +113,8 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
     ax1.set_xlabel("Time (frames)")
     ax1.set_ylabel("-1/k^2")
     ax1.set_title(f"Pulse Waveform @ Target FPS: {fps}")
+    # Per-axis autoscaler, set_ylim only when the window extrema move past the threshold
+    y_scaler = AxisAutoscaler(ax1)
 
     # Lower left - Status panel
     ax2 = fig.add_subplot(gs[1, 0])
@@ -172,7 +137,6 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
 
     def update_plot(frame_num):
         nonlocal x_data, y_data, frame_count, k_squared_values
-        nonlocal peak_freq, last_peak_update
         nonlocal fps_counter, fps_last_time, current_fps
 
         # FPS calculation and counter reset
@@ -199,9 +163,11 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
                     "Status:\n"
                     f"Running (Target FPS: {fps})\n"
                     f"Actual FPS: {current_fps:.1f}\n"
+                    + (f"Camera rate: {resampler.rate:.1f} Hz\n" if resampler.rate else "")
                 )
 
         ret, frame = cap.read()
+        timestamp = time.perf_counter()
         if not ret:
             status_text.set_text("Status:\nFrame capture failed!")
             return line, freq_display, status_text
@@ -219,38 +185,35 @@ def s_DSCA(data_type=0, initial_power=50, camera_index=0, fps=60, size=496, roi_
         roi_frame = frame[y1:y2, x1:x2]
         processing_value = cac_k(roi_frame, data_type)
 
-        x_data.append(len(x_data))
-        y_data.append(processing_value)
         k_squared_values.append(processing_value)
 
-        # Apply bandpass filter
-        if len(y_data) > 60:
-            filtered_y_data = bandpass_filter(list(y_data), 0.5, 4, 23, 2)
-            filtered_y_data = deque(filtered_y_data, maxlen=500)
-        else:
-            filtered_y_data = y_data
+        bpm = heart_rate.bpm
+        beat = None
+        for grid_t, grid_value in resampler.process(timestamp, processing_value):
+            x_data.append(len(x_data))
+            y_data.append(grid_value)
+
+            # Apply streaming bandpass filter to the new grid sample only
+            pulse_filter.set_fs(resampler.fs)
+            filtered_value = pulse_filter.process(grid_value)
+            filtered_y_data.append(filtered_value)
+            y_scaler.push(filtered_value)
+            bpm = heart_rate.update(grid_t, filtered_value)
+            beat = beat_detector.update(grid_t, filtered_value) or beat
 
         # Update time-domain plot
         line.set_data(range(len(x_data)), filtered_y_data)
         ax1.set_xlim(150, max(500, len(x_data)))
-        update_y_axis(ax1, filtered_y_data)
-
-        # Calculate peak frequency (update once per second)
-        current_time = time.time()
-        if current_time - last_peak_update >= 1.0 and len(filtered_y_data) >= fft_window_size:
-            recent_data = list(filtered_y_data)[-fft_window_size:]
-            xf, yf = compute_fft(recent_data, 20)
-
-            if len(xf) > 0:
-                mask = (xf >= 0) & (xf <= 5)
-                if sum(mask) > 0:
-                    max_idx = np.argmax(yf[mask])
-                    peak_freq = xf[mask][max_idx]
-                    freq_display.set_text(
-                        f"Current Pulse Rate:\n"
-                        f"{peak_freq * 60+2:.1f} BPM\n"
-                    )
-                    last_peak_update = current_time
+        y_scaler.update()
+
+        if bpm is not None or beat is not None:
+            lines = ["Current Pulse Rate:", f"{bpm:.1f} BPM" if bpm is not None else "--"]
+            if beat_detector.bpm is not None:
+                lines.append(f"Last beat: {beat_detector.bpm:.1f} BPM")
+            hrv = beat_detector.hrv
+            if hrv.rmssd is not None and hrv.sdnn is not None:
+                lines.append(f"RMSSD: {hrv.rmssd:.0f} ms  SDNN: {hrv.sdnn:.0f} ms")
+            freq_display.set_text("\n".join(lines))
 
         return line, freq_display, status_text
 